@@ -1,16 +1,281 @@
-from dataclasses import dataclass
-from typing import List, Dict
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, List, Dict, Iterator, Optional
+import threading
 import sqlite3
+import unicodedata
+import shutil
+import json
+import os
+import re
 
-from .prefs import DATA, KitData, AuthorData, QueryData
-from .files import Paths
+from .prefs import DATA, KitData, AuthorData, QueryData, DatabaseConfig
+from .files import Paths, write_atomic
 
 
 @dataclass
 class ManifestData:
     """Dataclass for the release information from the manifest.json file."""
-    version: str    # The version of the database.
-    file: str       # The name of the database file.
+    version: str        # The version of the database.
+    file: str           # The name of the database file.
+    sha256: str = None  # The hex digest of the database file, to verify the download.
+    compressed: str = None  # The name of the compressed database file (.gz, .xz or .zst).
+    atlas: str = None  # The name of the image atlas packing the avatars and banners.
+    atlas_index: str = None  # The name of the json file with the offsets of the images in the atlas.
+    # Changeset file names, keyed on the database version each one upgrades from.
+    changes: Dict[str, str] = None
+
+
+# Field names of the dataclasses built from the database rows.
+KIT_FIELDS = {field.name for field in fields(KitData)}
+AUTHOR_FIELDS = {field.name for field in fields(AuthorData)}
+
+
+def kit_from_row(row: sqlite3.Row) -> KitData:
+    """Builds the kit data from a row of the kits table.
+
+    Notes:
+        Columns are matched by name, so older databases with a different column order or
+        missing optional columns, like the bundled kits.db, can still be read.
+
+    Args:
+        row: The row to convert.
+
+    Returns:
+        The kit's data class.
+    """
+    return KitData(**{key: row[key] for key in row.keys() if key in KIT_FIELDS})
+
+
+def author_from_row(row: sqlite3.Row) -> AuthorData:
+    """Builds the author data from a row of the authors table.
+
+    Args:
+        row: The row to convert.
+
+    Returns:
+        The author's data class.
+    """
+    return AuthorData(**{key: row[key] for key in row.keys() if key in AUTHOR_FIELDS})
+
+
+class ConnectionManager:
+    """Keeps one long-lived, read-only connection to the database per thread.
+
+    Notes:
+        sqlite connections can't be shared between threads, so each thread lazily opens its own.
+        When the database file is replaced, call invalidate() and every thread will reopen its
+        connection the next time it is requested.
+    """
+
+    def __init__(self, database: Path) -> None:
+        """Initialization of the ConnectionManager.
+
+        Args:
+            database: The path to the database to connect to.
+        """
+        self.database = database
+        self.generation = 0
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        """Gets the connection for the current thread, opening it if required.
+
+        Returns:
+            connection: The read-only connection to the database.
+        """
+        local = self._local
+        connection = getattr(local, "connection", None)
+        if connection is None or local.generation != self.generation:
+            if connection is not None:
+                # The database has been replaced, drop the stale connection.
+                connection.close()
+            local.connection = self._open()
+            local.generation = self.generation
+        return local.connection
+
+    def invalidate(self) -> None:
+        """Marks all open connections as stale so they are reopened on next use."""
+        self.generation += 1
+
+    def _open(self) -> sqlite3.Connection:
+        """Opens a new read-only connection to the database.
+
+        Returns:
+            connection: The newly opened connection.
+        """
+        connection = sqlite3.connect(
+            f"{self.database.as_uri()}?mode=ro",
+            uri=True,
+            cached_statements=DatabaseConfig.CACHED_STATEMENTS
+        )
+        connection.row_factory = sqlite3.Row
+        connection.execute(f"PRAGMA mmap_size = {DatabaseConfig.MMAP_SIZE}")
+        connection.execute(f"PRAGMA cache_size = {DatabaseConfig.CACHE_SIZE}")
+        return connection
+
+
+# Shared connections to the kits database.
+CONNECTIONS = ConnectionManager(Paths.DATABASE)
+
+
+def install_database(source: Path) -> None:
+    """Swaps a downloaded database file in as the local database.
+
+    Notes:
+        The file is moved over the local database in one atomic step, so readers only ever see
+        the old or the complete new database. On Windows the file can't be replaced while it's
+        open, so the new content is copied in with sqlite's backup API in a single transaction.
+
+    Args:
+        source: The downloaded database, in the same directory as the local database.
+    """
+    try:
+        os.replace(source, Paths.DATABASE)
+    except PermissionError:
+        with sqlite3.connect(source) as new_database, sqlite3.connect(Paths.DATABASE) as database:
+            new_database.backup(database)
+        source.unlink()
+    # Readers must reopen their connections to see the new database.
+    CONNECTIONS.invalidate()
+
+
+def valid_changeset(changeset: Any, version: str) -> bool:
+    """Checks a changeset has the shape apply_changes expects and upgrades from the given version.
+
+    Args:
+        changeset: The parsed changeset json.
+        version: The database version the changeset must upgrade from.
+
+    Returns:
+        True if the changeset can be applied, otherwise False.
+    """
+    if not isinstance(changeset, dict) or changeset.get("from") != version:
+        return False
+    if not changeset.get("to") or not isinstance(changeset["to"], str):
+        return False
+    for table in ("kits", "authors"):
+        changes = changeset.get(table, {})
+        if not isinstance(changes, dict):
+            return False
+        deletes = changes.get("delete", [])
+        upserts = changes.get("upsert", [])
+        if not isinstance(deletes, list) or not all(isinstance(name, str) for name in deletes):
+            return False
+        if not isinstance(upserts, list):
+            return False
+        if not all(isinstance(row, dict) and isinstance(row.get("name"), str) for row in upserts):
+            return False
+    return True
+
+
+def apply_changes(database: Path, changesets: List[Dict]) -> None:
+    """Applies a chain of catalog changesets to the database in one transaction.
+
+    Notes:
+        A changeset holds the rows to upsert and the names to delete per table, e.g.
+        {"from": "0.1.1", "to": "0.1.2", "kits": {"upsert": [{...}], "delete": ["name"]}}.
+        Rows are matched by name, so existing rows keep their id. If any changeset fails to
+        apply, none of them are.
+
+    Args:
+        database: The path to the database to update.
+        changesets: The changesets to apply, in order.
+    """
+    with sqlite3.connect(database) as connection:
+        for changeset in changesets:
+            for table in ("kits", "authors"):
+                changes = changeset.get(table, {})
+                # Only accept columns that exist in the local table.
+                columns = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                for name in changes.get("delete", []):
+                    connection.execute(f"DELETE FROM {table} WHERE name = ?", (name,))
+                for row in changes.get("upsert", []):
+                    row = {key: value for key, value in row.items() if key in columns and key != "id"}
+                    assignments = ", ".join(f"{key} = :{key}" for key in row)
+                    cursor = connection.execute(f"UPDATE {table} SET {assignments} WHERE name = :name", row)
+                    if not cursor.rowcount:
+                        connection.execute(
+                            f"INSERT INTO {table} ({', '.join(row)}) VALUES ({', '.join(f':{key}' for key in row)})",
+                            row
+                        )
+
+
+def build_search_index(database: Path) -> bool:
+    """Creates the full-text search index for the given database if it does not exist yet.
+
+    Notes:
+        The index is an external content FTS5 table over the kits table, so it is kept in
+        sync with the kits table through triggers. This requires sqlite to be built with FTS5.
+
+    Args:
+        database: The path to the database to index.
+
+    Returns:
+        True if the database has a usable search index, otherwise False.
+    """
+    with sqlite3.connect(database) as connection:
+        if connection.execute(QueryData.HasSearchIndex).fetchone():
+            # Index already exists, nothing to build.
+            return True
+        try:
+            connection.execute(QueryData.CreateSearchIndex)
+        except sqlite3.OperationalError:
+            # The sqlite library does not support FTS5.
+            return False
+        connection.executescript(QueryData.CreateSearchTriggers)
+        # Populate the index from the existing kits.
+        connection.execute(QueryData.RebuildSearchIndex)
+
+    # The schema changed, ensure readers pick up the new index.
+    CONNECTIONS.invalidate()
+    return True
+
+
+def search_words(search_text: str) -> List[str]:
+    """Splits the user search text into the words the full-text index matches on.
+
+    Notes:
+        Words are lower-cased and stripped of diacritics to mirror the unicode61 tokenizer.
+
+    Args:
+        search_text: The text to split.
+
+    Returns:
+        The words of every comma separated term, in order.
+    """
+    # Decompose accented characters and drop the combining marks.
+    decomposed = unicodedata.normalize("NFKD", search_text.lower())
+    text = "".join(c for c in decomposed if not unicodedata.combining(c))
+    # Split the search text into individual terms and then into words.
+    return [word for term in text.split(",") for word in re.findall(r"[^\W_]+", term)]
+
+
+def search_expression(search_text: str) -> str:
+    """Converts the user search text into an FTS5 match expression.
+
+    Every comma separated term must match, and every word is matched as a prefix.
+
+    Example:
+        "mesh op, uv" -> '"mesh"* AND "op"* AND "uv"*'
+
+    Args:
+        search_text: The text to convert.
+
+    Returns:
+        The match expression, or an empty string if there is nothing to search for.
+    """
+    # Quote each word so FTS5 operators in user text are treated as plain words.
+    return " AND ".join(f'"{word}"*' for word in search_words(search_text))
+
+
+def has_search_index() -> bool:
+    """Checks if the database has a full-text search index.
+
+    Returns:
+        True if the kits_search table exists, otherwise False.
+    """
+    return CONNECTIONS.connection().execute(QueryData.HasSearchIndex).fetchone() is not None
 
 
 def search_kits(search_text: str) -> List[int]:
@@ -18,6 +283,56 @@ def search_kits(search_text: str) -> List[int]:
 
     Args:
         search_text: The text to search for.
+
+    Returns:
+        The database id of all matching kits, ordered by relevance.
+    """
+    expression = search_expression(search_text)
+    if not expression and search_text.replace(",", " ").strip():
+        # Only punctuation, no search terms left that a kit could match.
+        return []
+
+    cursor = CONNECTIONS.connection().cursor()
+    if not expression:
+        # Nothing to search for, all kits match.
+        cursor.execute(QueryData.SelectKitIds)
+    elif has_search_index():
+        # Rank all matching kits with the full-text index.
+        cursor.execute(QueryData.SearchIndex, [expression])
+    else:
+        # No full-text index available, fall back to scanning the kits table.
+        return _search_kits_like(search_text, cursor)
+    # Get id of all matching kits.
+    return [kit[0] for kit in cursor.fetchall()]
+
+
+def rank_kits(search_text: str, kit_ids: List[int]) -> List[int]:
+    """Ranks the given kits against the search text with the full-text index.
+
+    Args:
+        search_text: The text to search for.
+        kit_ids: The database id of the kits to rank.
+
+    Returns:
+        The database id of the given kits that match, ordered by relevance.
+    """
+    expression = search_expression(search_text)
+    if not expression or not kit_ids:
+        return []
+    query = QueryData.RankKits.format(ids=", ".join("?" * len(kit_ids)))
+    cursor = CONNECTIONS.connection().execute(query, [expression, *kit_ids])
+    return [kit[0] for kit in cursor.fetchall()]
+
+
+def _search_kits_like(search_text: str, cursor: sqlite3.Cursor) -> List[int]:
+    """Searches the kits table with LIKE patterns, used when no full-text index is available.
+
+    Args:
+        search_text: The text to search for.
+        cursor: The cursor to the database to search.
+
+    Returns:
+        The database id of all matching kits.
     """
     # Split the search text into individual terms.
     search_terms = [s.strip() for s in search_text.split(",")]
@@ -31,54 +346,158 @@ def search_kits(search_text: str) -> List[int]:
         # For every '?' in the query, add the search term to the params.
         params.extend([f"%{term}%"] * QueryData.SearchTerm.count("?"))
 
-    # Search the database.
-    with sqlite3.connect(Paths.DATABASE) as connection:
-        cursor = connection.cursor()
-        # Search all fields in kits table for the search text.
-        cursor.execute(query, params)
-        # Get id of all matching kits and remap from 1-indexed to 0-indexed.
-        return [kit[0] - 1 for kit in cursor.fetchall()]
+    # Search all fields in kits table for the search text.
+    cursor.execute(query, params)
+    # Get id of all matching kits.
+    return [kit[0] for kit in cursor.fetchall()]
 
 
-def get_kits() -> Dict[str, KitData]:
-    """Gets all kits from the database.
+class KitCatalog:
+    """Process-wide, in-memory copy of the kits and authors tables.
+
+    Notes:
+        The catalog is keyed on the version in the database manifest. It is loaded once and only
+        re-hydrated after invalidate() is called and the manifest reports a different version.
+    """
+
+    def __init__(self) -> None:
+        """Initialization of the KitCatalog."""
+        self.version: Optional[str] = None
+        self.loaded = False
+        self.stale = True
+        self.kits: Dict[int, KitData] = {}
+        self.kits_by_name: Dict[str, KitData] = {}
+        self.kits_by_author: Dict[str, List[KitData]] = {}
+        self.authors: Dict[str, AuthorData] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> 'KitCatalog':
+        """Loads the catalog from the database if it is not loaded or out-of-date.
+
+        Returns:
+            catalog: The loaded catalog.
+        """
+        if not self.stale:
+            return self
+
+        with self._lock:
+            if not self.stale:
+                # Another thread loaded the catalog while we waited.
+                return self
+            version = get_database_version()
+            if not self.loaded or version != self.version:
+                self._hydrate()
+                self.version = version
+                self.loaded = True
+            self.stale = False
+        return self
+
+    def invalidate(self) -> None:
+        """Flags the catalog to be checked against the database manifest on next use."""
+        self.stale = True
+
+    def _hydrate(self) -> None:
+        """Reads all kits and authors from the database and rebuilds the lookup indexes."""
+        connection = CONNECTIONS.connection()
+        kits = [kit_from_row(k) for k in connection.execute(QueryData.SelectKits)]
+        authors = [author_from_row(a) for a in connection.execute(QueryData.SelectAuthors)]
+
+        kits_by_author = {}
+        for kit in kits:
+            kits_by_author.setdefault(kit.author, []).append(kit)
+
+        # Swap the indexes in one go so readers never see a partial catalog.
+        self.kits = {kit.id: kit for kit in kits}
+        self.kits_by_name = {kit.name: kit for kit in kits}
+        self.kits_by_author = kits_by_author
+        self.authors = {author.name: author for author in authors}
+
+
+# Shared catalog of all kits and authors.
+CATALOG = KitCatalog()
+
+
+def get_database_version() -> Optional[str]:
+    """Gets the version of the local database from its manifest.
 
     Returns:
-        kits: A list of all kits in the database.
+        version: The version of the local database, or None if there is no manifest.
     """
-    with sqlite3.connect(Paths.DATABASE) as connection:
-        cursor = connection.cursor()
-        cursor.execute(QueryData.SelectKits)
-        return {k[1]: KitData(*k) for k in cursor.fetchall()}
+    if not Paths.DATABASE_MANIFEST.exists():
+        return None
+    return json.loads(Paths.DATABASE_MANIFEST.read_text()).get('version')
 
 
-def get_author(author: str) -> AuthorData:
-    """Gets the author data from the database.
+def seed_database() -> bool:
+    """Copies the database bundled with the kit into place if there is no local database yet.
 
-    Args:
-        author: The author's name to get data for.
+    Notes:
+        The seeded database gets a 0.0.0 manifest, so the next sync always replaces it.
 
     Returns:
-        author_data: The author's data class.
+        True if a local database is available, otherwise False.
+    """
+    if Paths.DATABASE.exists():
+        return True
+    if not Paths.DATABASE_BUNDLED.exists():
+        return False
+    shutil.copyfile(Paths.DATABASE_BUNDLED, Paths.DATABASE)
+    write_atomic(Paths.DATABASE_MANIFEST, json.dumps({'version': "0.0.0", 'file': Paths.DATABASE.name}).encode())
+    # Index the copy for full-text search, this also invalidates the open connections.
+    build_search_index(Paths.DATABASE)
+    CATALOG.invalidate()
+    return True
+
+
+def iter_kits(batch_size: int = 100) -> Iterator[List[KitData]]:
+    """Yields all kits from the database in id order, one batch at a time.
+
+    Notes:
+        Batches are sliced from the catalog when it is loaded, otherwise they are read with a
+        keyset paginated query so the first batch is available without reading the whole table.
+
+    Args:
+        batch_size: The number of kits per batch.
+
+    Yields:
+        The next batch of kits.
     """
-    search_params = [f"%{author}%"]
+    if CATALOG.loaded and not CATALOG.stale:
+        kits = list(CATALOG.kits.values())
+        for start in range(0, len(kits), batch_size):
+            yield kits[start:start + batch_size]
+        return
 
-    with sqlite3.connect(Paths.DATABASE) as connection:
-        cursor = connection.cursor()
-        cursor.execute(QueryData.SelectAuthor, search_params)
-        return AuthorData(*cursor.fetchone())
+    last_id = 0
+    while True:
+        cursor = CONNECTIONS.connection().execute(QueryData.SelectKitsPage, [last_id, batch_size])
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        yield [kit_from_row(k) for k in rows]
+        last_id = rows[-1][0]
 
 
-def get_author_kits(author: str) -> List[KitData]:
-    """Gets all kits from the database by the given author.
+def get_author(author: str) -> AuthorData:
+    """Gets the author data from the database.
 
     Args:
         author: The author's name to get data for.
 
     Returns:
-        A list of all kits by the author.
+        author_data: The author's data class.
+
+    Raises:
+        LookupError: If no author matches the given name.
     """
-    with sqlite3.connect(Paths.DATABASE) as connection:
-        cursor = connection.cursor()
-        cursor.execute(QueryData.SelectKitsByAuthor, [author])
-        return [KitData(*k) for k in cursor.fetchall()]
+    authors = CATALOG.load().authors
+    if author in authors:
+        return authors[author]
+
+    # No exact match, fall back to the first author containing the name.
+    search_name = author.lower()
+    for author_data in authors.values():
+        if search_name in author_data.name.lower():
+            return author_data
+
+    raise LookupError(f"No author found for: {author}")
@@ -1,7 +1,8 @@
-from os import environ
+import os
 from sys import platform
 from dataclasses import dataclass
 from pathlib import Path
+from urllib import parse
 
 
 def get_cache_dir() -> Path:
@@ -25,6 +26,18 @@ def get_cache_dir() -> Path:
     return cache_dir
 
 
+def write_atomic(path: Path, data: bytes) -> None:
+    """Writes data to a file so readers only ever see the old or the complete new content.
+
+    Args:
+        path: The file to write.
+        data: The data to write.
+    """
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
 @dataclass(frozen=True)
 class Paths:
     """Paths for Modo Kit Central resources."""
@@ -32,6 +45,7 @@ class Paths:
     KIT_LIBS = KIT_ROOT / f"libs"
     RESOURCES = KIT_ROOT / "resources"
     DATABASE = RESOURCES / "mkc_kits.db"
+    DATABASE_BUNDLED = RESOURCES / "kits.db"
     DATABASE_MANIFEST = RESOURCES / "manifest.json"
     TEST_RELEASE = RESOURCES / "test_release.json"
     AVATAR = RESOURCES / "avatars" / "profile.png"
@@ -43,3 +57,32 @@ class Paths:
     # Installer paths.
     KIT_CACHE = get_cache_dir()
     KIT_DOWNLOADS = KIT_CACHE / "kits"
+    HTTP_CACHE = KIT_CACHE / "http"
+    AVATAR_CACHE = KIT_CACHE / "avatars"
+    BANNER_CACHE = KIT_CACHE / "banners"
+    ATLAS_INDEX = KIT_CACHE / "atlas.json"
+    KIT_HISTORY = KIT_CACHE / "history"
+
+
+def get_avatar_path(author: str) -> Path:
+    """Gets the path to the cached, pre-scaled avatar of an author.
+
+    Args:
+        author: The author's name, as defined in the database.
+
+    Returns:
+        The path to the cached avatar, which may not exist yet.
+    """
+    return Paths.AVATAR_CACHE / f"{parse.quote(author, safe='')}.png"
+
+
+def get_banner_path(kit_name: str) -> Path:
+    """Gets the path to the cached banner of a kit.
+
+    Args:
+        kit_name: The kit's name, as defined in the database.
+
+    Returns:
+        The path to the cached banner, which may not exist yet.
+    """
+    return Paths.BANNER_CACHE / f"{parse.quote(kit_name, safe='')}.png"
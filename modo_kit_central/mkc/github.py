@@ -1,19 +1,20 @@
 import json
-from http import HTTPStatus
-from typing import Dict, Any
-from urllib import request, parse
+from pathlib import Path
+from typing import Dict, Any, Set
+from urllib import parse
 
 try:
-    from PySide6.QtCore import QObject, Signal, qDebug
-    from PySide6.QtGui import QPixmap
+    from PySide6.QtCore import QObject, Signal, Qt, QBuffer, QIODevice, qDebug
+    from PySide6.QtGui import QImage
 except ImportError:
-    from PySide2.QtCore import QObject, Signal, qDebug
-    from PySide2.QtGui import QPixmap
+    from PySide2.QtCore import QObject, Signal, Qt, QBuffer, QIODevice, qDebug
+    from PySide2.QtGui import QImage
 
-from .prefs import URLS
-from .files import Paths
+from .prefs import URLS, ImageConfig
+from .files import Paths, write_atomic, get_avatar_path, get_banner_path
 from .utils import up_to_date
-from .database import ManifestData
+from .network import HTTP_CLIENT, RESPONSE_CACHE, fetch, download, get_decompressor
+from .database import ManifestData, CATALOG, build_search_index, install_database, apply_changes, valid_changeset
 
 
 class DatabaseWorker(QObject):
@@ -29,6 +30,8 @@ class DatabaseWorker(QObject):
         self.manifest_url: str = None
         self.database_url: str = None
         self.assets: Dict[str, Any] = None
+        self.release_id: str = None
+        self.updated = False
 
     def run(self) -> None:
         """Runs the worker to fetch the latest database."""
@@ -41,56 +44,204 @@ class DatabaseWorker(QObject):
     def _update_database(self) -> None:
         """Initializes the database update process."""
         release_data = get_latest_release(URLS.MODO_KIT_DATABASE)
+        self.release_id = str(release_data['id'])
         # Extract the assets from the release data.
         self.assets = {asset['name']: asset for asset in release_data['assets']}
         # Get the manifest data from the latest release.
         self._fetch_manifest()
         self._validate_version()
+        try:
+            self._fetch_atlas()
+        except Exception as error:
+            # The images are not essential, the database is still up-to-date.
+            print(f"Error: {error}")
+        # Ensure the local database has a full-text search index.
+        build_search_index(Paths.DATABASE)
 
     def _fetch_manifest(self) -> None:
         """Gets the manifest data from the latest release."""
         # Find the download url to the manifest.json file in the assets.
         self.manifest_url = self.assets.get('manifest.json', {}).get('browser_download_url', '')
-        # Download the manifest.json data.
-        with request.urlopen(self.manifest_url) as response:
-            if response.status == HTTPStatus.OK:
-                self.manifest_data = json.loads(response.read().decode())
-                # Return the manifest data as a ManifestData object.
-                self.manifest = ManifestData(**self.manifest_data)
-            else:
-                raise Exception(f"Failed to fetch the database manifest: {response.status}")
+        # Download the manifest.json data, only once per release.
+        self.manifest_data = json.loads(fetch(self.manifest_url, version=self.release_id).decode())
+        # Return the manifest data as a ManifestData object.
+        self.manifest = ManifestData(**self.manifest_data)
+
+    def _fetch_compressed_database(self, download_path: Path) -> bool:
+        """Downloads the compressed database file, decompressing it while it streams to disk.
+
+        Args:
+            download_path: The file to write the decompressed database to.
+
+        Returns:
+            True if the database was downloaded, False if the raw database should be used instead.
+        """
+        compressed_url = self.assets.get(self.manifest.compressed, {}).get('browser_download_url')
+        decompressor = get_decompressor(self.manifest.compressed or "")
+        if not compressed_url or not decompressor:
+            return False
+        try:
+            download(compressed_url, download_path, sha256=self.manifest.sha256, decompressor=decompressor)
+        except Exception as error:
+            print(f"Error: {error}")
+            return False
+        self.database_url = compressed_url
+        return True
+
+    def _fetch_atlas(self) -> None:
+        """Downloads the image atlas of the release and slices it into the image caches.
+
+        Notes:
+            The atlas packs the avatars and banners of the whole catalog into one image, so they
+            arrive in a single transfer. It's only downloaded once per database version.
+        """
+        if not self.manifest.atlas or not self.manifest.atlas_index:
+            return
+        index = json.loads(Paths.ATLAS_INDEX.read_text()) if Paths.ATLAS_INDEX.exists() else {}
+        if index.get('version') != self.manifest.version:
+            index_url = self.assets.get(self.manifest.atlas_index, {}).get('browser_download_url', '')
+            atlas_url = self.assets.get(self.manifest.atlas, {}).get('browser_download_url', '')
+            index = json.loads(fetch(index_url, version=self.release_id).decode())
+            atlas_path = Paths.KIT_CACHE / self.manifest.atlas
+            download(atlas_url, atlas_path)
+            try:
+                atlas = QImage(atlas_path.as_posix())
+                if atlas.isNull():
+                    raise Exception(f"Failed to read the image atlas: {self.manifest.atlas}")
+                slice_atlas(atlas, index)
+            finally:
+                atlas_path.unlink(missing_ok=True)
+            index['version'] = self.manifest.version
+            write_atomic(Paths.ATLAS_INDEX, json.dumps(index).encode())
+        # The avatars sliced from the atlas are current, skip revalidating them one by one.
+        AVATARS_SYNCED.update(index.get('avatars', {}))
 
     def _fetch_database(self) -> None:
         """Retrieves the database file from the latest release."""
-        # Get the url to the database file from the assets.
-        self.database_url = self.assets.get(self.manifest.file, {}).get('browser_download_url', '')
-        with request.urlopen(self.database_url) as response:
-            if response.status == HTTPStatus.OK:
-                # Write the database file to the resources' directory.
-                Paths.DATABASE.write_bytes(response.read())
-                # Since we managed to download the database, update the manifest file as well.
-                Paths.DATABASE_MANIFEST.write_text(json.dumps(self.manifest_data))
-            else:
-                raise Exception(f"Failed to fetch the database: {response.status}")
+        # Stream the database next to the local one, verifying it against the manifest.
+        download_path = Paths.DATABASE.with_name(f"{Paths.DATABASE.name}.download")
+        # Prefer the compressed database, falling back to the raw database file.
+        if not self._fetch_compressed_database(download_path):
+            self.database_url = self.assets.get(self.manifest.file, {}).get('browser_download_url', '')
+            download(self.database_url, download_path, sha256=self.manifest.sha256)
+        # Index the new database for full-text search before readers can see it.
+        build_search_index(download_path)
+        # Swap the new database in, then update the manifest file as well.
+        install_database(download_path)
+        write_atomic(Paths.DATABASE_MANIFEST, json.dumps(self.manifest_data).encode())
+        # Reload the catalog from the new database on next use.
+        CATALOG.invalidate()
+        self.updated = True
+
+    def _fetch_changes(self, version: str) -> bool:
+        """Updates the local database with the changesets published since its version.
+
+        Args:
+            version: The version of the local database.
+
+        Returns:
+            True if the database was updated, False if the chain of changesets is broken.
+        """
+        changes = self.manifest.changes if isinstance(self.manifest.changes, dict) else {}
+        changesets = []
+        # Follow the chain of changesets from the local version up to the latest version.
+        while version != self.manifest.version:
+            changes_url = self.assets.get(changes.get(version), {}).get('browser_download_url')
+            if not changes_url:
+                return False
+            try:
+                changeset = json.loads(fetch(changes_url, version=self.release_id).decode())
+            except (OSError, ValueError) as error:
+                print(f"Error: {error}")
+                return False
+            if not valid_changeset(changeset, version):
+                print(f"Error: Unexpected changeset from version {version}: {changes_url}")
+                return False
+            changesets.append(changeset)
+            version = changeset['to']
+            if len(changesets) > len(changes):
+                # The chain loops back on itself.
+                return False
+
+        # Apply the whole chain at once, so a failure leaves the database untouched.
+        try:
+            apply_changes(Paths.DATABASE, changesets)
+        except Exception as error:
+            # Rows of an unexpected shape fail the transaction too, fall back to the full download.
+            print(f"Error: {error}")
+            return False
+        write_atomic(Paths.DATABASE_MANIFEST, json.dumps(self.manifest_data).encode())
+        # Reload the catalog from the updated database on next use.
+        CATALOG.invalidate()
+        self.updated = True
+        return True
 
     def _validate_version(self) -> None:
         """Validates the version of the database is up-to-date."""
-        # Check if we have a local manifest file.
-        if Paths.DATABASE_MANIFEST.exists():
+        # Check if we have a local manifest file and database.
+        if Paths.DATABASE_MANIFEST.exists() and Paths.DATABASE.exists():
             # Get the version from the local manifest file.
             version = json.loads(Paths.DATABASE_MANIFEST.read_text()).get('version', "0.0.0")
             # Check if the latest version is greater than the local version.
             if not up_to_date(version, self.manifest.version):
-                # Download the database if the version is not up-to-date.
-                self._fetch_database()
+                # Apply only what changed, download the whole database if that is not possible.
+                if not self._fetch_changes(version):
+                    self._fetch_database()
         else:
-            # No local manifest file, download the database.
+            # No local manifest file or database, download the database.
             self._fetch_database()
 
 
+def save_image(image: QImage, path: Path) -> None:
+    """Saves an image as png, so readers only ever see a complete file.
+
+    Args:
+        image: The image to save.
+        path: The file to save the image to.
+    """
+    buffer = QBuffer()
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(path, bytes(buffer.data()))
+
+
+def scale_banner(image: QImage) -> QImage:
+    """Scales a banner down to the width it is displayed at.
+
+    Args:
+        image: The banner image.
+
+    Returns:
+        The scaled banner image.
+    """
+    if image.width() > ImageConfig.BANNER_WIDTH:
+        return image.scaledToWidth(ImageConfig.BANNER_WIDTH, Qt.SmoothTransformation)
+    return image
+
+
+def slice_atlas(atlas: QImage, index: Dict[str, Any]) -> None:
+    """Cuts the avatars and banners out of an image atlas into the image caches.
+
+    Args:
+        atlas: The image atlas.
+        index: The offsets of the images in the atlas, as {"avatars": {name: [x, y, width, height]},
+            "banners": {kit name: [x, y, width, height]}}.
+    """
+    for author, rect in index.get('avatars', {}).items():
+        avatar = atlas.copy(*rect).scaledToHeight(ImageConfig.AVATAR_HEIGHT, Qt.SmoothTransformation)
+        save_image(avatar, get_avatar_path(author))
+    for kit_name, rect in index.get('banners', {}).items():
+        save_image(scale_banner(atlas.copy(*rect)), get_banner_path(kit_name))
+
+
+# Authors whose cached avatar has been revalidated during this session.
+AVATARS_SYNCED: Set[str] = set()
+
+
 class AvatarWorker(QObject):
     """Worker class to fetch the author's avatar."""
-    finished = Signal(QPixmap)
+    finished = Signal(QImage)
     error = Signal(str)
 
     def __init__(self, author: str) -> None:
@@ -105,31 +256,89 @@ class AvatarWorker(QObject):
     def run(self) -> None:
         """Runs the worker to fetch the author's avatar."""
         try:
-            avatar_pixmap = self._fetch_avatar()
-            if avatar_pixmap:
-                self.finished.emit(avatar_pixmap)
+            avatar_image = self._fetch_avatar()
+            AVATARS_SYNCED.add(self.author)
+            if avatar_image is None:
+                # The cached avatar is still current, signal that with a null image.
+                self.finished.emit(QImage())
+            elif not avatar_image.isNull():
+                self.finished.emit(avatar_image)
             else:
                 self.error.emit("Failed to fetch the author's avatar.")
         except Exception as e:
             self.error.emit(f"Failed to fetch the author's avatar: {e}")
 
-    def _fetch_avatar(self) -> QPixmap:
-        """Gets the author's avatar from the database.
+    def _fetch_avatar(self) -> QImage:
+        """Revalidates the author's avatar, updating the avatar cache if it changed.
+
+        Notes:
+            The image is decoded and scaled here, off the GUI thread. It is returned as a QImage,
+            as QPixmaps can only be created on the GUI thread.
 
         Returns:
-            pixmap: The avatar image as a QPixmap object.
+            The scaled avatar image, or None if the cached avatar is still current.
         """
         # Ensure author name is URL safe.
         url_author_name = parse.quote(self.author)
         avatar_url = URLS.AUTHOR_AVATAR.format(author=url_author_name)
-        with request.urlopen(avatar_url) as response:
-            if response.status == HTTPStatus.OK:
-                # Load the avatar image into a QPixmap object.
-                pixmap = QPixmap()
-                pixmap.loadFromData(response.read())
-                return pixmap
-            else:
-                raise Exception(f"Failed to fetch the author's avatar: {response.status}")
+        avatar_path = get_avatar_path(self.author)
+        cached = RESPONSE_CACHE.load(avatar_url)
+        # Concurrent requests for the same avatar, e.g. from several author tabs, share one download.
+        avatar_data = fetch(avatar_url)
+        if avatar_path.exists() and cached and cached[0] == RESPONSE_CACHE.load(avatar_url)[0]:
+            return None
+
+        image = QImage.fromData(avatar_data)
+        if image.isNull():
+            return image
+        image = image.scaledToHeight(ImageConfig.AVATAR_HEIGHT, Qt.SmoothTransformation)
+        # Store the scaled avatar, so reopened tabs show it without decoding or scaling.
+        save_image(image, avatar_path)
+        return image
+
+
+class BannerWorker(QObject):
+    """Worker class to fetch the kit banners, one after the other."""
+    finished = Signal(str, QImage)
+    error = Signal(str, str)
+
+    def load(self, kit_name: str, author: str) -> None:
+        """Fetches the banner of a kit and stores it in the banner cache.
+
+        Args:
+            kit_name: The kit's name, as defined in the database.
+            author: The name of the kit's author.
+        """
+        try:
+            self.finished.emit(kit_name, self._fetch_banner(kit_name, author))
+        except Exception as e:
+            self.error.emit(kit_name, f"Failed to fetch the banner of {kit_name}: {e}")
+
+    @staticmethod
+    def _fetch_banner(kit_name: str, author: str) -> QImage:
+        """Downloads a kit's banner, scaling it to the display width off the GUI thread.
+
+        Notes:
+            The database repo only publishes the full size banner.png, there is no thumbnail
+            asset. Bandwidth is saved by only fetching the banners of the kits that are opened,
+            once, and memory by only keeping the scaled copy.
+
+        Args:
+            kit_name: The kit's name, as defined in the database.
+            author: The name of the kit's author.
+
+        Returns:
+            The scaled banner image.
+        """
+        banner_url = URLS.KIT_BANNER.format(author=parse.quote(author), kit=parse.quote(kit_name))
+        # Only the scaled banner is kept, the full size image is not cached.
+        with HTTP_CLIENT.open(banner_url) as response:
+            image = QImage.fromData(response.read())
+        if image.isNull():
+            raise Exception("Invalid image data.")
+        image = scale_banner(image)
+        save_image(image, get_banner_path(kit_name))
+        return image
 
 
 def get_latest_release_github(repo_url: str) -> Dict:
@@ -145,12 +354,8 @@ def get_latest_release_github(repo_url: str) -> Dict:
     # Example: https://github.com/Pixel-Fondue/modo-kit-database -> Pixel-Fondue/modo-kit-database
     owner_repo = repo_url.split(URLS.GITHUB_ROOT)[1]
     api_url = URLS.GITHUB_RELEASE_API.format(owner=owner_repo)
-    # Fetch the latest release data from the GitHub API.
-    with request.urlopen(api_url) as response:
-        if response.status == HTTPStatus.OK:
-            return json.loads(response.read())
-        else:
-            raise Exception(f"Failed to fetch the latest release: {response.status}")
+    # Fetch the latest release data from the GitHub API, revalidating any cached response.
+    return json.loads(fetch(api_url))
 
 
 def get_latest_release(repo_url: str) -> Dict:
@@ -143,5 +143,7 @@ class KitCentralWindow(QMainWindow):
         Args:
             event: The close event from the Window.
         """
+        # Stop the search thread, the window is closed long before modo quits.
+        self.tab_kits.search_bar.stop()
         self.close()
         event.accept()
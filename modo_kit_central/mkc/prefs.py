@@ -46,6 +46,8 @@ class URLS:
     MODO_KIT_DATABASE = "https://github.com/Pixel-Fondue/modo-kit-database"
     GITHUB_RELEASE_API = "https://api.github.com/repos/{owner}/releases/latest"
     AUTHOR_AVATAR = "https://raw.githubusercontent.com/Pixel-Fondue/modo-kit-database/refs/heads/main/kits/{author}/avatar.png"
+    # Full size banner, the database repo has no thumbnails, scaled down once after download.
+    KIT_BANNER = "https://raw.githubusercontent.com/Pixel-Fondue/modo-kit-database/refs/heads/main/kits/{author}/{kit}/banner.png"
 
 
 @dataclass
@@ -54,6 +56,14 @@ class Text:
     title = "Modo Kit Central"
     author = "Author: <a href='{}' style='color: white'>{}</a>"
     lbl_link = "<a href='{link}' style='color: white'>{text}</a>"
+    install_pending = "Cancel - Preparing..."
+    install_progress = "Cancel - {percent}% - {rate}/s - {eta} left"
+    install_loading = "Loading..."
+    installed = "Installed"
+    update_all = "Update All ({count})"
+    update_all_progress = "Cancel Updates ({count} left)"
+    rollback = "Rollback"
+    rollback_version = "v{version} - installed {date}"
     info_block = (
         "Welcome to Modo Kit Central! aka MKC\n\n"
         "MKC is a tool to help you find and install kits for Modo."
@@ -109,6 +119,16 @@ class GithubAsset:
     name: str   # The name of the asset.
     size: int   # The size of the asset.
     url: str    # The URL to download the asset.
+    digest: str = None  # The hex sha256 digest of the asset, if GitHub reports it.
+
+
+@dataclass
+class KitVersion:
+    """Dataclass for a version of a kit installed by MKC, kept for rollbacks."""
+    version: str      # The version of the kit.
+    lpk: str          # The path to the kept lpk file.
+    manifest: Dict    # The manifest.json data of the release.
+    installed: float  # The time the version was installed, in seconds since the epoch.
 
 
 @dataclass
@@ -156,7 +176,94 @@ class QueryData:
     SelectKits: str = "SELECT * FROM kits WHERE TRUE"
     SearchTerm: str = " AND (name LIKE ? OR author LIKE ? OR search LIKE ? OR Description LIKE ?)"
     SelectAuthor: str = "SELECT * FROM authors WHERE name LIKE ?"
+    SelectAuthors: str = "SELECT * FROM authors ORDER BY id"
     SelectKitsByAuthor: str = "SELECT * FROM kits WHERE author = ?"
+    SelectKitIds: str = "SELECT id FROM kits ORDER BY id"
+    SelectKitsPage: str = "SELECT * FROM kits WHERE id > ? ORDER BY id LIMIT ?"
+    # Full-text search index over the searchable columns of the kits table.
+    HasSearchIndex: str = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'kits_search'"
+    CreateSearchIndex: str = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS kits_search USING fts5("
+        "name, author, search, description, content='kits', content_rowid='id', tokenize='unicode61')"
+    )
+    # Triggers to keep the external content index in sync with the kits table.
+    CreateSearchTriggers: str = """
+        CREATE TRIGGER IF NOT EXISTS kits_search_ai AFTER INSERT ON kits BEGIN
+            INSERT INTO kits_search(rowid, name, author, search, description)
+            VALUES (new.id, new.name, new.author, new.search, new.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS kits_search_ad AFTER DELETE ON kits BEGIN
+            INSERT INTO kits_search(kits_search, rowid, name, author, search, description)
+            VALUES ('delete', old.id, old.name, old.author, old.search, old.description);
+        END;
+        CREATE TRIGGER IF NOT EXISTS kits_search_au AFTER UPDATE ON kits BEGIN
+            INSERT INTO kits_search(kits_search, rowid, name, author, search, description)
+            VALUES ('delete', old.id, old.name, old.author, old.search, old.description);
+            INSERT INTO kits_search(rowid, name, author, search, description)
+            VALUES (new.id, new.name, new.author, new.search, new.description);
+        END;
+    """
+    RebuildSearchIndex: str = "INSERT INTO kits_search(kits_search) VALUES ('rebuild')"
+    # Rank matches with bm25, weighting name > author > search terms > description.
+    SearchIndex: str = (
+        "SELECT rowid FROM kits_search WHERE kits_search MATCH ? "
+        "ORDER BY bm25(kits_search, 10.0, 5.0, 2.0, 1.0), rowid"
+    )
+    # Rank the matches among the given kits, formatted with a placeholder per kit id.
+    RankKits: str = (
+        "SELECT rowid FROM kits_search WHERE kits_search MATCH ? AND rowid IN ({ids}) "
+        "ORDER BY bm25(kits_search, 10.0, 5.0, 2.0, 1.0), rowid"
+    )
+
+
+@dataclass
+class DatabaseConfig:
+    """Dataclass for the tuning of the read-only database connections."""
+    MMAP_SIZE = 64 * 1024 * 1024  # Bytes of the database file to memory map.
+    CACHE_SIZE = -16 * 1024       # Page cache size, negative values are in KiB.
+    CACHED_STATEMENTS = 128       # Number of prepared statements kept per connection.
+
+
+@dataclass
+class SearchConfig:
+    """Dataclass for the tuning of the kit search."""
+    DEBOUNCE_MS = 150  # Milliseconds to wait after the last keystroke before searching.
+    CACHE_SIZE = 64    # Number of recent search results to keep.
+    MAX_RANK_IDS = 900  # Most kits re-ranked by id, above this the index is searched in full.
+
+
+@dataclass
+class PopulateConfig:
+    """Dataclass for the tuning of the kits list population."""
+    BATCH_SIZE = 100    # Number of kits read from the catalog per batch.
+    TIME_SLICE_MS = 8   # Milliseconds spent adding kits per event loop cycle.
+
+
+@dataclass
+class NetworkConfig:
+    """Dataclass for the tuning of the network transfers."""
+    CHUNK_SIZE = 64 * 1024  # Bytes read per chunk when streaming a download to disk.
+    TIMEOUT = 30  # Seconds to wait on a connection before giving up.
+    MAX_IDLE_CONNECTIONS = 4  # Idle keep-alive connections kept open per host.
+    MAX_REDIRECTS = 5  # Redirects followed before giving up on a request.
+    USER_AGENT = "Modo-Kit-Central"  # GitHub's API rejects requests without a user agent.
+    PROGRESS_INTERVAL = 0.1  # Seconds between the progress updates of a download.
+    MAX_RETRIES = 3  # Times a dropped resumable download is resumed before giving up.
+
+
+@dataclass
+class InstallConfig:
+    """Dataclass for the tuning of the kit installs."""
+    MAX_WORKERS = 3  # Kits resolved and downloaded at the same time.
+    CACHE_BUDGET = 1024 ** 3  # Bytes of downloaded lpks kept for reinstalls.
+    HISTORY_DEPTH = 5  # Installed versions kept per kit for rollbacks.
+
+
+@dataclass
+class ImageConfig:
+    """Dataclass for the sizes images are cached and displayed at."""
+    AVATAR_HEIGHT = 100  # Height of the author avatars, in pixels.
+    BANNER_WIDTH = 512  # Width of the kit banners, the width of the window.
 
 
 @dataclass
@@ -0,0 +1,184 @@
+"""Background kit search for Modo Kit Central."""
+from collections import OrderedDict
+from typing import List, Dict, Set, Tuple, Optional
+
+try:
+    from PySide6.QtCore import QObject, Signal
+except ImportError:
+    # Fallback to PySide2 if PySide6 is not available
+    from PySide2.QtCore import QObject, Signal
+
+from .prefs import SearchConfig
+from .database import CATALOG, CONNECTIONS, search_kits, search_words, rank_kits, has_search_index
+
+# A normalized search, the sorted unique words of the search text.
+SearchKey = Tuple[str, ...]
+
+
+class SearchSession:
+    """Keeps the state of consecutive searches to avoid going back to the database.
+
+    Notes:
+        Results are kept in a bounded LRU keyed on the normalized search. When a search only
+        narrows the previous one, e.g. "mesh" -> "meshop", the previous results are filtered in
+        memory and only the remaining kits are ranked by the index. All state is dropped when the
+        catalog or database changes.
+    """
+
+    def __init__(self, cache_size: int = SearchConfig.CACHE_SIZE) -> None:
+        """Initialization of the SearchSession.
+
+        Args:
+            cache_size: The number of search results to keep.
+        """
+        self.cache_size = cache_size
+        self.cache: 'OrderedDict[SearchKey, List[int]]' = OrderedDict()
+        self.previous_key: Optional[SearchKey] = None
+        self.previous_ids: List[int] = []
+        self.state: Optional[Tuple[Optional[str], int]] = None
+        self.indexed = False
+        self.tokens: Dict[int, Set[str]] = {}
+
+    def search(self, search_text: str) -> List[int]:
+        """Searches for the given text, reusing earlier results where possible.
+
+        Args:
+            search_text: The text to search for.
+
+        Returns:
+            The database id of all matching kits, ordered by relevance.
+        """
+        self._validate()
+        key = tuple(sorted(set(search_words(search_text))))
+        if not key:
+            # Blank or only punctuation, nothing to cache or refine.
+            return search_kits(search_text)
+
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            kit_ids = self.cache[key]
+        elif self.indexed and self._narrows(key):
+            kit_ids = self._refine(search_text, key)
+        else:
+            kit_ids = search_kits(search_text)
+
+        self._store(key, kit_ids)
+        return list(kit_ids)
+
+    def clear(self) -> None:
+        """Drops all cached search results."""
+        self.cache.clear()
+        self.previous_key = None
+        self.previous_ids = []
+        self.tokens = {}
+
+    def _validate(self) -> None:
+        """Clears the session if the catalog version or the database has changed."""
+        state = (CATALOG.load().version, CONNECTIONS.generation)
+        if state != self.state:
+            self.clear()
+            self.state = state
+            # Refinement mirrors the full-text index, it can't mirror the LIKE fallback.
+            self.indexed = has_search_index()
+
+    def _store(self, key: SearchKey, kit_ids: List[int]) -> None:
+        """Stores the results of a search as the latest and in the LRU cache.
+
+        Args:
+            key: The normalized search.
+            kit_ids: The results of the search.
+        """
+        self.cache[key] = kit_ids
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        self.previous_key = key
+        self.previous_ids = kit_ids
+
+    def _narrows(self, key: SearchKey) -> bool:
+        """Checks if the given search can only match a subset of the previous search.
+
+        Every previous word must be the prefix of a new word, as all words are prefix matched.
+
+        Args:
+            key: The normalized search.
+
+        Returns:
+            True if the previous results can be refined, otherwise False.
+        """
+        if not self.previous_key or key == self.previous_key:
+            return False
+        return all(any(word.startswith(old) for word in key) for old in self.previous_key)
+
+    def _refine(self, search_text: str, key: SearchKey) -> List[int]:
+        """Filters the previous results down to the kits matching every word of the search.
+
+        Args:
+            search_text: The text to search for.
+            key: The normalized search.
+
+        Returns:
+            The matching kits, ranked for the new search as a full search would.
+        """
+        if not self.tokens:
+            self._build_tokens()
+        kit_ids = [
+            kit_id for kit_id in self.previous_ids
+            if all(any(token.startswith(word) for token in self.tokens.get(kit_id, ())) for word in key)
+        ]
+        if len(kit_ids) > SearchConfig.MAX_RANK_IDS:
+            # Too many kits to bind, search the index in full.
+            return search_kits(search_text)
+        # The previous order was ranked for the previous words, rank the kits again.
+        return rank_kits(search_text, kit_ids)
+
+    def _build_tokens(self) -> None:
+        """Tokenizes the searchable fields of every kit the same way the full-text index does."""
+        for kit in CATALOG.load().kits.values():
+            text = " ".join([kit.name or "", kit.author or "", ",".join(kit.search), kit.description or ""])
+            self.tokens[kit.id] = set(search_words(text))
+
+
+class SearchWorker(QObject):
+    """Worker class to run kit searches off the GUI thread.
+
+    Notes:
+        Requests are queued to the worker's thread in order. Any request that is older than
+        the latest one by the time it is picked up is dropped without touching the database.
+    """
+    finished = Signal(int, list)
+    error = Signal(str)
+
+    def __init__(self) -> None:
+        """Initialization of the SearchWorker."""
+        super().__init__()
+        self.latest_request = 0
+        self.session = SearchSession()
+
+    def is_stale(self, request_id: int) -> bool:
+        """Checks if a newer search has been requested.
+
+        Args:
+            request_id: The id of the search request to check.
+
+        Returns:
+            True if the request has been superseded, otherwise False.
+        """
+        return request_id != self.latest_request
+
+    def run(self, request_id: int, search_text: str) -> None:
+        """Runs the search for the given request.
+
+        Args:
+            request_id: The id of the search request.
+            search_text: The text to search for.
+        """
+        if self.is_stale(request_id):
+            return
+        try:
+            kit_ids = self.session.search(search_text)
+        except Exception as e:
+            self.error.emit(f"Failed to search kits: {e}")
+            return
+        if not self.is_stale(request_id):
+            self.finished.emit(request_id, kit_ids)
@@ -1,39 +1,79 @@
 """Update module for modo kit central."""
+import os
 import json
-from typing import Dict
+import time
+import shutil
+import threading
+from dataclasses import asdict
+from typing import Dict, List, Optional, Callable, Tuple
 from pathlib import Path
-from urllib import request
-from http import HTTPStatus
+from urllib import parse
+
+try:
+    from PySide6.QtCore import QObject, QThread, Signal
+except ImportError:
+    from PySide2.QtCore import QObject, QThread, Signal
 
 from lx import command
 
-from .files import Paths
+from .files import Paths, write_atomic
+from .network import ARTIFACTS, IN_FLIGHT, DownloadCancelled, fetch, download_resumable, url_key
 from .github import get_latest_release
-from .prefs import KitData, KitManifest, GithubAsset
+from .database import CATALOG
+from .prefs import DATA, KitData, KitManifest, KitAction, KitVersion, GithubAsset, NetworkConfig, InstallConfig
 
 
-def kit_download(lpk_asset: GithubAsset) -> Path:
-    """Download the lpk file from the given URL.
+def kit_download(lpk_asset: GithubAsset, progress: Callable[[int, int], None] = None,
+                 cancel: threading.Event = None) -> Path:
+    """Download the lpk file from the given URL, unless it's in the download cache.
 
     Args:
         lpk_asset: The lpk asset from GitHub.
+        progress: Optional callback with the bytes received so far and the total size.
+        cancel: Optional event to cancel the download.
 
     Returns:
         The path to the downloaded lpk file.
     """
-    # Pull the lpk file from the url.
-    with request.urlopen(lpk_asset.url) as response:
-        # Ensure the url is valid and the response is successful.
-        if response.status == HTTPStatus.OK:
-            # Get the path to the lpk file.
-            lpk_path = Paths.KIT_DOWNLOADS / lpk_asset.name
-            # Ensure the directory exists.
-            lpk_path.parent.mkdir(parents=True, exist_ok=True)
-            # Write the lpk file to disk.
-            lpk_path.write_bytes(response.read())
-            return lpk_path
-        else:
-            raise Exception(f"Failed to fetch lpk: {response.status}")
+    # Concurrent installs of the same lpk share one download, each with its own progress and cancel.
+    return IN_FLIGHT.run_transfer(
+        ("lpk", lpk_asset.url), lambda report: _kit_download(lpk_asset, report, cancel),
+        progress=progress, cancel=cancel
+    )
+
+
+def _kit_download(lpk_asset: GithubAsset, progress: Callable[[int, int], None] = None,
+                  cancel: threading.Event = None) -> Path:
+    """Download the lpk file from the given URL, unless it's in the download cache.
+
+    Args:
+        lpk_asset: The lpk asset from GitHub.
+        progress: Optional callback with the bytes received so far and the total size.
+        cancel: Optional event to cancel the download.
+
+    Returns:
+        The path to the cached lpk file.
+    """
+    cached_lpk = ARTIFACTS.get(lpk_asset.url, lpk_asset.size, lpk_asset.digest)
+    if cached_lpk:
+        if progress:
+            progress(lpk_asset.size, lpk_asset.size)
+        return cached_lpk
+
+    # Download to a folder per URL, releases often reuse the same lpk name.
+    lpk_path = Paths.KIT_DOWNLOADS / url_key(lpk_asset.url) / lpk_asset.name
+    # Stream the lpk file to disk, resuming any earlier attempt, and check it's complete.
+    download_resumable(
+        lpk_asset.url, lpk_path, size=lpk_asset.size, sha256=lpk_asset.digest, progress=progress, cancel=cancel
+    )
+    # Keep the lpk for reinstalls.
+    cached_lpk = ARTIFACTS.store(lpk_asset.url, lpk_asset.size, lpk_path, lpk_asset.digest)
+    try:
+        lpk_path.parent.rmdir()
+    except OSError:
+        # Another download of the URL is still using the folder.
+        pass
+    return cached_lpk
 
 
 def get_assets(release_data: Dict) -> Dict[str, GithubAsset]:
@@ -49,37 +89,49 @@ def get_assets(release_data: Dict) -> Dict[str, GithubAsset]:
         asset['name']: GithubAsset(
             name=asset['name'],
             size=asset['size'],
-            url=asset['browser_download_url']
+            url=asset['browser_download_url'],
+            digest=get_asset_digest(asset)
         ) for asset in release_data['assets']
     }
 
 
-def get_manifest(manifest_asset: GithubAsset) -> KitManifest:
+def get_asset_digest(asset: Dict) -> Optional[str]:
+    """Gets the sha256 digest GitHub reports for a release asset.
+
+    Args:
+        asset: The asset data from the release data.
+
+    Returns:
+        The hex sha256 digest, or None if the asset has none.
+    """
+    digest = asset.get('digest') or ""
+    return digest.split(":", 1)[1] if digest.startswith("sha256:") else None
+
+
+def get_manifest(manifest_asset: GithubAsset, release_id: str = None) -> KitManifest:
     """Fetch the manifest file from the given URL.
 
     Args:
         manifest_asset: The manifest asset from GitHub.
+        release_id: The id of the release the manifest belongs to, skips the download if cached.
 
     Returns:
         The KitManifest dataclass containing the manifest data.
     """
-    # Pull the manifest file from the url.
-    with request.urlopen(manifest_asset.url) as response:
-        # Ensure the url is valid and the response is successful.
-        if response.status == HTTPStatus.OK:
-            # Load the manifest data from the response.
-            manifest_data = json.loads(response.read().decode())
-            # Unpack the manifest data into the KitManifest dataclass.
-            return KitManifest(**manifest_data)
-        else:
-            raise Exception(f"Failed to fetch manifest: {response.status}")
+    # Pull the manifest file from the url, or the cache.
+    manifest_data = json.loads(fetch(manifest_asset.url, version=release_id).decode())
+    # Unpack the manifest data into the KitManifest dataclass.
+    return KitManifest(**manifest_data)
 
 
-def update_kit(kit: KitData) -> None:
-    """Update the given kit.
+def get_latest_kit(kit: KitData) -> Tuple[KitManifest, GithubAsset]:
+    """Gets the manifest and the lpk asset of the latest release of the given kit.
 
     Args:
-        kit: The kit to update.
+        kit: The kit to get the release for.
+
+    Returns:
+        The manifest of the latest release and its lpk asset.
     """
     # Check if there is a manifest file url for the kit.
     if not kit.repo:
@@ -94,12 +146,479 @@ def update_kit(kit: KitData) -> None:
         raise Exception("No manifest.json found in the release assets!")
 
     manifest_asset = assets['manifest.json']
-    kit_manifest = get_manifest(manifest_asset)
+    kit_manifest = get_manifest(manifest_asset, release_id=str(release_data['id']))
 
     latest_lpk = assets.get(kit_manifest.latest, None)
     if not latest_lpk:
         raise Exception("No latest lpk found in the release assets!")
+    return kit_manifest, latest_lpk
+
+
+def install_lpk(lpk_file: Path) -> None:
+    """Loads the lpk into modo, which installs the kit.
 
-    lpk_file = kit_download(latest_lpk)
-    # Load the lpk into modo.
+    Notes:
+        Modo commands must run on the main thread.
+
+    Args:
+        lpk_file: The path to the lpk file.
+    """
     command('app.load', filename=lpk_file.as_posix())
+
+
+def get_kit_action(kit: KitData) -> KitAction:
+    """Gets the action available for a kit, based on the installed version.
+
+    Args:
+        kit: The kit from the database.
+
+    Returns:
+        INSTALL if the kit is not installed, UPDATE if another version is, otherwise UNINSTALL.
+    """
+    installed_kit = (DATA.modo_kits or {}).get(kit.name)
+    if not installed_kit:
+        return KitAction.INSTALL
+    if installed_kit.version != kit.version:
+        return KitAction.UPDATE
+    return KitAction.UNINSTALL
+
+
+def get_outdated_kits() -> List[KitData]:
+    """Gets all installable kits with a newer version in the database than the one installed.
+
+    Returns:
+        The outdated kits, in database order.
+    """
+    return [
+        kit for kit in CATALOG.load().kits.values()
+        if kit.installable and get_kit_action(kit) == KitAction.UPDATE
+    ]
+
+
+def refresh_inventory() -> None:
+    """Reloads the installed kits from modo."""
+    if DATA.local:
+        # The installed kits are mocked, nothing to reload.
+        return
+    from .modo import populate_installed_kits
+    populate_installed_kits()
+
+
+class KitHistory:
+    """Keeps the lpk and manifest of the kit versions installed by MKC, to roll back to them.
+
+    Notes:
+        The lpks are kept as <root>/<kit>/<version>/<name>, apart from the download cache so
+        they aren't evicted. Up to InstallConfig.HISTORY_DEPTH versions are kept per kit.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Initialization of the KitHistory.
+
+        Args:
+            root: The directory to keep the lpks in.
+        """
+        self.root = root
+        self.lock = threading.Lock()
+
+    @property
+    def index_path(self) -> Path:
+        """The path to the index of the installed versions."""
+        return self.root / "history.json"
+
+    def _load_index(self) -> Dict[str, List[Dict]]:
+        """Loads the installed versions of all kits.
+
+        Returns:
+            The installed versions per kit name, newest first.
+        """
+        try:
+            return json.loads(self.index_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: Dict[str, List[Dict]]) -> None:
+        """Saves the installed versions of all kits.
+
+        Args:
+            index: The installed versions per kit name.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        write_atomic(self.index_path, json.dumps(index).encode())
+
+    def versions(self, kit_name: str) -> List[KitVersion]:
+        """Gets the kept versions of a kit.
+
+        Args:
+            kit_name: The name of the kit.
+
+        Returns:
+            The versions whose lpk is still on disk, the latest install first.
+        """
+        with self.lock:
+            entries = self._load_index().get(kit_name, [])
+        return [KitVersion(**entry) for entry in entries if Path(entry["lpk"]).exists()]
+
+    def get(self, kit_name: str, version: str) -> Optional[KitVersion]:
+        """Gets a kept version of a kit.
+
+        Args:
+            kit_name: The name of the kit.
+            version: The version of the kit.
+
+        Returns:
+            The kept version, or None if it isn't kept.
+        """
+        return next((entry for entry in self.versions(kit_name) if entry.version == version), None)
+
+    def record(self, kit_name: str, lpk_file: Path, manifest: KitManifest) -> KitVersion:
+        """Records an installed version of a kit, keeping a copy of its lpk.
+
+        Args:
+            kit_name: The name of the kit.
+            lpk_file: The installed lpk file.
+            manifest: The manifest of the installed release.
+
+        Returns:
+            The recorded version.
+        """
+        kit_dir = self.root / parse.quote(kit_name, safe='')
+        kept_lpk = kit_dir / parse.quote(manifest.version, safe='') / lpk_file.name
+        if kept_lpk != lpk_file:
+            kept_lpk.parent.mkdir(parents=True, exist_ok=True)
+            kept_lpk.unlink(missing_ok=True)
+            try:
+                # Share the file with the download cache where the file system allows it.
+                os.link(lpk_file, kept_lpk)
+            except OSError:
+                shutil.copy2(lpk_file, kept_lpk)
+        recorded = KitVersion(
+            version=manifest.version, lpk=kept_lpk.as_posix(), manifest=asdict(manifest), installed=time.time()
+        )
+        with self.lock:
+            index = self._load_index()
+            entries = [entry for entry in index.get(kit_name, []) if entry["version"] != manifest.version]
+            entries.insert(0, asdict(recorded))
+            # Drop the oldest installs past the history depth.
+            for entry in entries[InstallConfig.HISTORY_DEPTH:]:
+                shutil.rmtree(Path(entry["lpk"]).parent, ignore_errors=True)
+            index[kit_name] = entries[:InstallConfig.HISTORY_DEPTH]
+            self._save_index(index)
+        return recorded
+
+
+# Shared history of the installed kit versions.
+HISTORY = KitHistory(Paths.KIT_HISTORY)
+
+
+def rollback_kit(kit_name: str, version: str) -> None:
+    """Reinstalls a previously installed version of a kit from its kept lpk, without the network.
+
+    Notes:
+        Modo commands must run on the main thread.
+
+    Args:
+        kit_name: The name of the kit.
+        version: The version to roll back to.
+    """
+    kit_version = HISTORY.get(kit_name, version)
+    if not kit_version:
+        raise Exception(f"Version {version} of {kit_name} is not kept, cannot roll back!")
+    install_lpk(Path(kit_version.lpk))
+    # Mark it as the latest install.
+    HISTORY.record(kit_name, Path(kit_version.lpk), KitManifest(**kit_version.manifest))
+
+
+class InstallWorker(QObject):
+    """Worker class to resolve and download a kit's latest lpk."""
+    progress = Signal(str, int, int, float, float)
+    finished = Signal(str, str)
+    cancelled = Signal(str)
+    error = Signal(str, str)
+
+    def __init__(self, kit: KitData) -> None:
+        """Initialization of the InstallWorker.
+
+        Args:
+            kit: The kit to install.
+        """
+        super().__init__()
+        self.kit = kit
+        self.manifest: Optional[KitManifest] = None
+        # Set from the GUI thread to cancel the install.
+        self.cancel_event = threading.Event()
+        self.start_time = 0.0
+        self.last_progress = 0.0
+        self.total = 0
+
+    def run(self) -> None:
+        """Runs the worker to download the kit's latest lpk."""
+        try:
+            self.manifest, lpk_asset = get_latest_kit(self.kit)
+            if self.cancel_event.is_set():
+                raise DownloadCancelled(f"Install of {self.kit.name} cancelled.")
+            self.total = lpk_asset.size
+            self.start_time = time.monotonic()
+            lpk_file = kit_download(lpk_asset, progress=self._on_progress, cancel=self.cancel_event)
+            self.finished.emit(self.kit.name, lpk_file.as_posix())
+        except DownloadCancelled:
+            self.cancelled.emit(self.kit.name)
+        except Exception as e:
+            self.error.emit(self.kit.name, f"Failed to install {self.kit.name}: {e}")
+
+    def _on_progress(self, received: int, total: int) -> None:
+        """Reports the download speed and remaining time, throttled to keep the GUI responsive.
+
+        Args:
+            received: The bytes received so far.
+            total: The total size of the download, 0 if unknown.
+        """
+        now = time.monotonic()
+        total = total or self.total
+        if now - self.last_progress < NetworkConfig.PROGRESS_INTERVAL and received < total:
+            return
+        self.last_progress = now
+        rate = received / max(now - self.start_time, 1e-6)
+        eta = (total - received) / rate if total and rate else -1.0
+        self.progress.emit(self.kit.name, received, total, rate, eta)
+
+    def cancel(self) -> None:
+        """Cancels the install, the download stops at its next chunk."""
+        self.cancel_event.set()
+
+
+class InstallManager(QObject):
+    """Runs the kit installs off the GUI thread, only loading the lpks into modo on the GUI thread.
+
+    Notes:
+        At most InstallConfig.MAX_WORKERS kits are resolved and downloaded at the same time, the
+        other installs wait in a queue. The installed kits are reloaded once all installs are done.
+    """
+    started = Signal(str)
+    progress = Signal(str, int, int, float, float)
+    finished = Signal(str)
+    cancelled = Signal(str)
+    error = Signal(str, str)
+    idle = Signal()
+    _shared: 'InstallManager' = None
+
+    def __init__(self) -> None:
+        """Initialization of the InstallManager."""
+        super().__init__()
+        self.jobs: Dict[str, tuple] = {}
+        self.queue: List[KitData] = []
+        # Kits of the current batch update, loaded in this order once downloaded.
+        self.batch: List[str] = []
+        self.downloaded: Dict[str, Optional[Path]] = {}
+        # Manifests of the downloaded kits, recorded in the history once loaded.
+        self.manifests: Dict[str, KitManifest] = {}
+
+    @classmethod
+    def shared(cls) -> 'InstallManager':
+        """Gets the install manager shared by all kit widgets.
+
+        Returns:
+            The shared install manager.
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def is_running(self, kit_name: str) -> bool:
+        """Checks if a kit is being installed, or waiting to be.
+
+        Args:
+            kit_name: The name of the kit.
+
+        Returns:
+            True if the kit is being installed.
+        """
+        return kit_name in self.jobs or any(kit.name == kit_name for kit in self.queue)
+
+    def pending(self) -> int:
+        """Gets the number of installs that are not done yet.
+
+        Returns:
+            The number of running and queued installs.
+        """
+        return len(self.jobs) + len(self.queue)
+
+    def install(self, kit: KitData) -> None:
+        """Queues the latest version of a kit to be installed in the background.
+
+        Args:
+            kit: The kit to install.
+        """
+        if self.is_running(kit.name):
+            return
+        self.queue.append(kit)
+        self.started.emit(kit.name)
+        self._start_next()
+
+    def update_all(self, kits: List[KitData]) -> None:
+        """Updates several kits, downloading them concurrently and loading them in order.
+
+        Args:
+            kits: The kits to update, in the order to load them in.
+        """
+        kits = [kit for kit in kits if not self.is_running(kit.name)]
+        self.batch.extend(kit.name for kit in kits)
+        for kit in kits:
+            self.install(kit)
+
+    def rollback(self, kit_name: str, version: str) -> None:
+        """Reinstalls a previously installed version of a kit from the local history.
+
+        Notes:
+            The lpk is already on disk, so it's loaded right away on the GUI thread.
+
+        Args:
+            kit_name: The name of the kit.
+            version: The version to roll back to.
+        """
+        if self.is_running(kit_name):
+            return
+        self.started.emit(kit_name)
+        try:
+            rollback_kit(kit_name, version)
+        except Exception as e:
+            error = f"Failed to roll back {kit_name}: {e}"
+            print(f"Error: {error}")
+            self.error.emit(kit_name, error)
+            return
+        self.finished.emit(kit_name)
+        self._check_idle()
+
+    def cancel(self, kit_name: str) -> None:
+        """Cancels the install of a kit.
+
+        Args:
+            kit_name: The name of the kit.
+        """
+        queued = [kit for kit in self.queue if kit.name == kit_name]
+        if queued:
+            # Not started yet, drop it from the queue.
+            self.queue.remove(queued[0])
+            self._on_done(kit_name, None)
+            self.cancelled.emit(kit_name)
+            self._check_idle()
+        elif kit_name in self.jobs:
+            self.jobs[kit_name][1].cancel()
+
+    def cancel_all(self) -> None:
+        """Cancels all running and queued installs."""
+        # Kits of the batch that are downloaded but still wait on earlier kits won't be loaded.
+        for kit_name in self.downloaded:
+            self.downloaded[kit_name] = None
+        for kit_name in [kit.name for kit in self.queue] + list(self.jobs):
+            self.cancel(kit_name)
+
+    def _start_next(self) -> None:
+        """Starts the queued installs, up to the maximum number of workers."""
+        while self.queue and len(self.jobs) < InstallConfig.MAX_WORKERS:
+            kit = self.queue.pop(0)
+            thread = QThread()
+            worker = InstallWorker(kit)
+            worker.moveToThread(thread)
+            worker.progress.connect(self.progress)
+            worker.finished.connect(self.on_finished)
+            worker.cancelled.connect(self.on_cancelled)
+            worker.error.connect(self.on_error)
+            thread.started.connect(worker.run)
+            self.jobs[kit.name] = (thread, worker)
+            thread.start()
+
+    def _stop(self, kit_name: str) -> None:
+        """Stops the thread of a finished install and starts the next queued one.
+
+        Args:
+            kit_name: The name of the kit.
+        """
+        thread, _worker = self.jobs.pop(kit_name)
+        thread.quit()
+        thread.wait()
+        self._start_next()
+
+    def _on_done(self, kit_name: str, lpk_file: Optional[Path]) -> None:
+        """Loads a downloaded lpk, waiting for the kits before it if it's part of a batch update.
+
+        Args:
+            kit_name: The name of the kit.
+            lpk_file: The downloaded lpk, None if the install failed or was cancelled.
+        """
+        if kit_name not in self.batch:
+            if lpk_file:
+                self._load(kit_name, lpk_file)
+            self.manifests.pop(kit_name, None)
+            return
+        self.downloaded[kit_name] = lpk_file
+        # Load the batch in order, as far as the kits have been downloaded.
+        while self.batch and self.batch[0] in self.downloaded:
+            batch_kit = self.batch.pop(0)
+            batch_lpk = self.downloaded.pop(batch_kit)
+            if batch_lpk:
+                self._load(batch_kit, batch_lpk)
+            self.manifests.pop(batch_kit, None)
+
+    def _load(self, kit_name: str, lpk_file: Path) -> None:
+        """Loads a downloaded lpk into modo.
+
+        Args:
+            kit_name: The name of the kit.
+            lpk_file: The path to the downloaded lpk file.
+        """
+        try:
+            install_lpk(lpk_file)
+        except Exception as e:
+            self.error.emit(kit_name, f"Failed to install {kit_name}: {e}")
+            return
+        manifest = self.manifests.get(kit_name)
+        if manifest:
+            # Keep the installed version to roll back to.
+            try:
+                HISTORY.record(kit_name, lpk_file, manifest)
+            except OSError as e:
+                print(f"Error: {e}")
+        self.finished.emit(kit_name)
+
+    def _check_idle(self) -> None:
+        """Reloads the installed kits once, after the last install is done."""
+        if not self.jobs and not self.queue and not self.batch:
+            refresh_inventory()
+            self.idle.emit()
+
+    def on_finished(self, kit_name: str, lpk_file: str) -> None:
+        """Loads the downloaded lpk into modo, on the GUI thread.
+
+        Args:
+            kit_name: The name of the kit.
+            lpk_file: The path to the downloaded lpk file.
+        """
+        self.manifests[kit_name] = self.jobs[kit_name][1].manifest
+        self._stop(kit_name)
+        self._on_done(kit_name, Path(lpk_file))
+        self._check_idle()
+
+    def on_cancelled(self, kit_name: str) -> None:
+        """Handles a cancelled install.
+
+        Args:
+            kit_name: The name of the kit.
+        """
+        self._stop(kit_name)
+        self.cancelled.emit(kit_name)
+        self._on_done(kit_name, None)
+        self._check_idle()
+
+    def on_error(self, kit_name: str, error: str) -> None:
+        """Handles the error from an install worker.
+
+        Args:
+            kit_name: The name of the kit.
+            error: The error raised by the worker.
+        """
+        print(f"Error: {error}")
+        self._stop(kit_name)
+        self.error.emit(kit_name, error)
+        self._on_done(kit_name, None)
+        self._check_idle()
@@ -45,3 +45,34 @@ def up_to_date(version_local: str, version_latest: str) -> bool:
     else:
         # Local version is up-to-date.
         return True
+
+
+def format_size(num_bytes: float) -> str:
+    """Formats a number of bytes for display.
+
+    Args:
+        num_bytes: The number of bytes.
+
+    Returns:
+        The size in the largest fitting unit, e.g. 1.5 MB.
+    """
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+
+def format_duration(seconds: float) -> str:
+    """Formats a duration for display.
+
+    Args:
+        seconds: The duration in seconds.
+
+    Returns:
+        The duration, e.g. 1m 05s, or ? if it is unknown.
+    """
+    if seconds < 0:
+        return "?"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
@@ -1,34 +1,37 @@
 """Core widgets for Modo Kit Central."""
+import time
 from pathlib import Path
-from typing import TYPE_CHECKING
+from typing import List, Callable, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from .tabs import KitsTab
 
 try:
     from PySide6.QtGui import QCursor, QDesktopServices, QMouseEvent
-    from PySide6.QtGui import QPixmap, QIcon
-    from PySide6.QtCore import Qt, QUrl, Signal
+    from PySide6.QtGui import QPixmap, QIcon, QImage
+    from PySide6.QtCore import Qt, QUrl, Signal, QThread, QTimer, QObject, QCoreApplication
     from PySide6.QtCore import QParallelAnimationGroup, QPropertyAnimation, QAbstractAnimation
     from PySide6.QtWidgets import (
         QLabel, QWidget, QVBoxLayout, QPushButton, QHBoxLayout, QToolButton, QScrollArea,
-        QPlainTextEdit, QSizePolicy, QFrame, QTabWidget, QLineEdit
+        QPlainTextEdit, QSizePolicy, QFrame, QTabWidget, QLineEdit, QMenu
     )
 except ImportError:
     # Fallback to PySide2 if PySide6 is not available
     from PySide2.QtGui import QCursor, QDesktopServices, QMouseEvent
-    from PySide2.QtGui import QPixmap, QIcon
-    from PySide2.QtCore import Qt, QUrl, Signal
+    from PySide2.QtGui import QPixmap, QIcon, QImage
+    from PySide2.QtCore import Qt, QUrl, Signal, QThread, QTimer, QObject, QCoreApplication
     from PySide2.QtCore import QParallelAnimationGroup, QPropertyAnimation, QAbstractAnimation
     from PySide2.QtWidgets import (
         QLabel, QWidget, QVBoxLayout, QPushButton, QHBoxLayout, QToolButton, QScrollArea,
-        QPlainTextEdit, QSizePolicy, QFrame, QTabWidget, QLineEdit
+        QPlainTextEdit, QSizePolicy, QFrame, QTabWidget, QLineEdit, QMenu
     )
 
-from ..prefs import Text, DATA, KitData, KitInfo, KitAction
-from ..files import Paths
-from ..database import search_kits
-from ..update import update_kit
+from ..prefs import Text, DATA, KitData, KitInfo, KitAction, SearchConfig
+from ..files import Paths, get_banner_path
+from ..search import SearchWorker
+from ..github import BannerWorker
+from ..update import HISTORY, InstallManager, get_kit_action
+from ..utils import format_size, format_duration
 
 
 class Button(QPushButton):
@@ -52,23 +55,97 @@ class Button(QPushButton):
 class Banner(QLabel):
     """Class to display a banner image."""
 
-    def __init__(self, image: Path, parent: QWidget = None) -> None:
+    def __init__(self, image: Path = None, pixmap: QPixmap = None, parent: QWidget = None) -> None:
         """Banner class to display a Kit banner.
 
         Args:
-            image: The image to display as the banner.
+            image: The image to display as the banner, scaled to fit the banner.
+            pixmap: The pixmap to display as the banner, already scaled to the display width.
             parent: The parent widget.
         """
         super(Banner, self).__init__(parent)
         self.setAlignment(Qt.AlignLeft)
         self.setContentsMargins(0, 0, 0, 0)
+        if pixmap is not None:
+            # Pre-scaled, draw it as is instead of scaling it on every paint.
+            self.setPixmap(pixmap)
+            self.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Fixed)
+            return
         self.setPixmap(QPixmap(image.as_posix()))
         # Remove padding for pixmap
         self.setScaledContents(True)
 
 
+class BannerLoader(QObject):
+    """Loads the remote kit banners in the background, sharing one worker between all kits."""
+    loaded = Signal(str, QPixmap)
+    requested = Signal(str, str)
+    _shared: 'BannerLoader' = None
+
+    def __init__(self) -> None:
+        """Initialization of the BannerLoader."""
+        super().__init__()
+        self.pending = set()
+        self.thread = QThread()
+        self.worker = BannerWorker()
+        self.worker.moveToThread(self.thread)
+        self.requested.connect(self.worker.load)
+        self.worker.finished.connect(self.on_finished)
+        self.worker.error.connect(self.on_error)
+        QCoreApplication.instance().aboutToQuit.connect(self.stop)
+        self.thread.start()
+
+    @classmethod
+    def shared(cls) -> 'BannerLoader':
+        """Gets the loader shared by all kit widgets.
+
+        Returns:
+            The shared banner loader.
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def request(self, kit_data: KitData) -> None:
+        """Queues the banner of a kit to be fetched, unless it is already queued.
+
+        Args:
+            kit_data: The kit to fetch the banner for.
+        """
+        if kit_data.name not in self.pending:
+            self.pending.add(kit_data.name)
+            self.requested.emit(kit_data.name, kit_data.author)
+
+    def on_finished(self, kit_name: str, banner: QImage) -> None:
+        """Converts a fetched banner to a pixmap for the kit widgets.
+
+        Args:
+            kit_name: The name of the kit the banner belongs to.
+            banner: The scaled banner image.
+        """
+        self.pending.discard(kit_name)
+        # Pixmaps can only be created on the GUI thread.
+        self.loaded.emit(kit_name, QPixmap.fromImage(banner))
+
+    def on_error(self, kit_name: str, error: str) -> None:
+        """Handles the error from the banner worker.
+
+        Args:
+            kit_name: The name of the kit the banner belongs to.
+            error: The error raised by the worker.
+        """
+        self.pending.discard(kit_name)
+        print(f"Error: {error}")
+
+    def stop(self) -> None:
+        """Stops the worker thread."""
+        self.thread.quit()
+        self.thread.wait()
+
+
 class FoldContainer(QWidget):
     """Class to create a collapsable container for the kit widgets."""
+    height_changed = Signal()
 
     def __init__(self, name: str = "test", version: str = None, parent: QWidget = None) -> None:
         """Initialization of the FoldContainer class.
@@ -90,6 +167,7 @@ class FoldContainer(QWidget):
         self.toggle_animation = QParallelAnimationGroup(self)
         self.content_area = QScrollArea(maximumHeight=0, minimumHeight=0)
         self.content = None
+        self.content_factory: Callable[[], QWidget] = None
         self._build_ui()
 
     def _build_ui(self) -> None:
@@ -115,14 +193,35 @@ class FoldContainer(QWidget):
         self.toggle_animation.addAnimation(QPropertyAnimation(self, b"minimumHeight"))
         self.toggle_animation.addAnimation(QPropertyAnimation(self, b"maximumHeight"))
         self.toggle_animation.addAnimation(QPropertyAnimation(self.content_area, b"maximumHeight"))
+        # Notify listeners, like item views, of every animation step.
+        self.toggle_animation.animationAt(2).valueChanged.connect(lambda value: self.height_changed.emit())
 
     def on_pressed(self) -> None:
         """Enable animation when user selects the bar."""
         checked = self.toggle_button.isChecked()
+        if not checked:
+            # Opening for the first time, build the deferred content so the animation fits it.
+            self.build_content()
         self.toggle_button.setArrowType(Qt.DownArrow if not checked else Qt.RightArrow)
         self.toggle_animation.setDirection(self.forward if not checked else self.reverse)
         self.toggle_animation.start()
 
+    def set_expanded(self, expanded: bool) -> None:
+        """Opens or closes the container immediately, without animating.
+
+        Args:
+            expanded: If the container should be opened.
+        """
+        if expanded:
+            self.build_content()
+        self.toggle_button.setChecked(expanded)
+        self.toggle_button.setArrowType(Qt.DownArrow if expanded else Qt.RightArrow)
+        for i in range(self.toggle_animation.animationCount()):
+            animation = self.toggle_animation.animationAt(i)
+            value = animation.endValue() if expanded else animation.startValue()
+            animation.targetObject().setProperty(bytes(animation.propertyName()).decode(), value)
+        self.height_changed.emit()
+
     def expand(self, value: int) -> None:
         """Expands the content to fit more stuff.
 
@@ -145,12 +244,36 @@ class FoldContainer(QWidget):
         self.layout.addWidget(self.content)
         # Set layout as the main content layout
         self.content_area.setLayout(self.layout)
+        # Show the content now, when added to a visible container Qt would only show it later,
+        # leaving it out of the size calculations below.
+        self.content.show()
         # Calculate the height of the widget when closed.
         self.collapsed_height = self.sizeHint().height() - self.content_area.maximumHeight()
         # Get the current height of the new layout with added content
         content_height = self.layout.sizeHint().height()
         self.animation_setup(content_height)
 
+    def fit_content(self) -> None:
+        """Resizes the container to the current height of its content, e.g. after an image loaded."""
+        self.animation_setup(self.layout.sizeHint().height())
+        if self.toggle_button.isChecked() and self.toggle_animation.state() != QAbstractAnimation.Running:
+            self.set_expanded(True)
+
+    def set_content_factory(self, factory: Callable[[], QWidget]) -> None:
+        """Defers building the displayable content until the container is first opened.
+
+        Args:
+            factory: Callable that builds the widget to set as the core content.
+        """
+        self.content_factory = factory
+
+    def build_content(self) -> None:
+        """Builds the deferred content if it has not been built yet."""
+        if self.content is None and self.content_factory is not None:
+            factory = self.content_factory
+            self.content_factory = None
+            self.set_content(factory())
+
     def animation_setup(self, height: int) -> None:
         """Sets up the animations for the container for a smooth open/close.
 
@@ -174,6 +297,7 @@ class FoldContainer(QWidget):
 class KitWidget(QWidget):
     """Class to display the information of a given kit."""
     author_clicked = Signal(str)
+    banner_added = Signal()
 
     def __init__(self, kit_data: KitData, show_author: bool = True) -> None:
         """Class to display the kit information in the main UI.
@@ -208,6 +332,11 @@ class KitWidget(QWidget):
 
         self.btn_install = Button("Install")
 
+        self.btn_rollback = Button(Text.rollback)
+        self.rollback_menu = QMenu(self.btn_rollback)
+        self.btn_rollback.setMenu(self.rollback_menu)
+        self.btn_rollback.hide()
+
         self.btn_help = Button("Help")
         self.url_help = QUrl(self.kit_data.help)
 
@@ -216,6 +345,7 @@ class KitWidget(QWidget):
         self.interactive_layout.setContentsMargins(0, 0, 0, 0)
         self.interactive_layout.addWidget(self.btn_link)
         self.interactive_layout.addWidget(self.btn_install)
+        self.interactive_layout.addWidget(self.btn_rollback)
         self.interactive_layout.addWidget(self.btn_help)
 
         # Check if banner is available and add it to the widget.
@@ -238,33 +368,93 @@ class KitWidget(QWidget):
     def _add_action_button(self) -> None:
         """Adds the action button."""
         installed_kit = DATA.modo_kits.get(self.kit_data.name, False)
-        if not installed_kit:
-            self.install_action = KitAction.INSTALL
+        self.install_action = get_kit_action(self.kit_data)
+        if self.install_action == KitAction.INSTALL:
             self.btn_install.setText("Install")
-        elif installed_kit and installed_kit.version != self.kit_data.version:
-            self.install_action = KitAction.UPDATE
+        elif self.install_action == KitAction.UPDATE:
             self.btn_install.setText(
                 f"Update! v{installed_kit.version} -> {self.kit_data.version}"
             )
             self.btn_install.setProperty('update', True)
         else:
             # The kit is already installed, show option to uninstall.
-            self.install_action = KitAction.UNINSTALL
             self.btn_install.setText("Uninstall")
             self.btn_install.setDisabled(True)
+        self._add_rollback_button()
+
+    def _add_rollback_button(self, installed_version: str = None) -> None:
+        """Shows the rollback button if other versions of the kit are kept from earlier installs.
+
+        Args:
+            installed_version: The installed version of the kit, looked up if not given.
+        """
+        if not installed_version:
+            installed_kit = (DATA.modo_kits or {}).get(self.kit_data.name)
+            installed_version = installed_kit.version if installed_kit else None
+        self.rollback_menu.clear()
+        for kit_version in HISTORY.versions(self.kit_data.name):
+            if kit_version.version == installed_version:
+                continue
+            date = time.strftime("%Y-%m-%d", time.localtime(kit_version.installed))
+            action = self.rollback_menu.addAction(Text.rollback_version.format(version=kit_version.version, date=date))
+            action.triggered.connect(lambda checked=False, version=kit_version.version: self._handle_rollback(version))
+        self.btn_rollback.setVisible(not self.rollback_menu.isEmpty())
+        self.btn_rollback.setEnabled(True)
 
     def _add_banner(self) -> None:
-        """Adds a banner to the widget if it exists."""
+        """Adds a banner to the widget if it exists, fetching remote banners in the background."""
         banner_image = Paths.BANNERS / f"{self.kit_data.name}.png"
         if banner_image.exists():
             self.banner = Banner(image=banner_image)
             self.base_layout.addWidget(self.banner)
+        elif self.kit_data.has_banner:
+            # Remote banners are cached at the display width, from the image atlas or fetched.
+            cached_banner = get_banner_path(self.kit_data.name)
+            if cached_banner.exists():
+                self._set_banner(QPixmap(cached_banner.as_posix()))
+            else:
+                loader = BannerLoader.shared()
+                loader.loaded.connect(self.on_banner_loaded)
+                loader.request(self.kit_data)
+
+    def _set_banner(self, pixmap: QPixmap) -> None:
+        """Adds a pre-scaled banner above the kit's details.
+
+        Args:
+            pixmap: The banner to add.
+        """
+        self.banner = Banner(pixmap=pixmap)
+        self.base_layout.insertWidget(0, self.banner)
+        # Qt only shows widgets added to a visible parent later, show it now so it's measured.
+        self.banner.show()
+
+    def on_banner_loaded(self, kit_name: str, pixmap: QPixmap) -> None:
+        """Adds the banner once it has been fetched.
+
+        Args:
+            kit_name: The name of the kit the banner belongs to.
+            pixmap: The banner to add.
+        """
+        if kit_name != self.kit_data.name:
+            return
+        BannerLoader.shared().loaded.disconnect(self.on_banner_loaded)
+        self._set_banner(pixmap)
+        self.banner_added.emit()
 
     def _connect_ui(self) -> None:
         """Connects the UI elements to their respective functions."""
         self.btn_link.clicked.connect(lambda: QDesktopServices.openUrl(self.url_view))
         self.btn_help.clicked.connect(lambda: QDesktopServices.openUrl(self.url_help))
         self.btn_install.clicked.connect(self._handle_action)
+        # Follow the installs running in the background, they outlive this widget.
+        installs = InstallManager.shared()
+        installs.started.connect(self.on_install_started)
+        installs.progress.connect(self.on_install_progress)
+        installs.finished.connect(self.on_install_finished)
+        installs.cancelled.connect(self.on_install_stopped)
+        installs.error.connect(self.on_install_stopped)
+        if installs.is_running(self.kit_data.name):
+            self.on_install_started(self.kit_data.name)
 
     def _emit_author(self, event: QMouseEvent) -> None:
         """Emits the author clicked signal when the author label is clicked.
@@ -275,9 +465,74 @@ class KitWidget(QWidget):
         self.author_clicked.emit(self.kit_data.author)
 
     def _handle_action(self) -> None:
-        """Handles the installable button."""
-        print(self.install_action.value)
-        update_kit(self.kit_data)
+        """Handles the installable button, starting or cancelling the install of the kit."""
+        installs = InstallManager.shared()
+        if installs.is_running(self.kit_data.name):
+            installs.cancel(self.kit_data.name)
+        else:
+            installs.install(self.kit_data)
+
+    def _handle_rollback(self, version: str) -> None:
+        """Rolls the kit back to a previously installed version.
+
+        Args:
+            version: The version to roll back to.
+        """
+        InstallManager.shared().rollback(self.kit_data.name, version)
+
+    def on_install_started(self, kit_name: str) -> None:
+        """Turns the install button into a cancel button.
+
+        Args:
+            kit_name: The name of the kit being installed.
+        """
+        if kit_name == self.kit_data.name:
+            self.btn_install.setText(Text.install_pending)
+            self.btn_rollback.setDisabled(True)
+
+    def on_install_progress(self, kit_name: str, received: int, total: int, rate: float, eta: float) -> None:
+        """Shows the progress of the install on the install button.
+
+        Args:
+            kit_name: The name of the kit being installed.
+            received: The bytes received so far.
+            total: The total size of the download.
+            rate: The download speed in bytes per second.
+            eta: The estimated seconds left, negative if unknown.
+        """
+        if kit_name != self.kit_data.name:
+            return
+        if total and received >= total:
+            self.btn_install.setText(Text.install_loading)
+            return
+        percent = int(received * 100 / total) if total else 0
+        self.btn_install.setText(
+            Text.install_progress.format(percent=percent, rate=format_size(rate), eta=format_duration(eta))
+        )
+
+    def on_install_finished(self, kit_name: str) -> None:
+        """Shows the kit as installed.
+
+        Args:
+            kit_name: The name of the installed kit.
+        """
+        if kit_name == self.kit_data.name:
+            self.install_action = KitAction.NONE
+            self.btn_install.setText(Text.installed)
+            self.btn_install.setDisabled(True)
+            # The installed kits are only reloaded once all installs are done, the latest install is current.
+            kit_versions = HISTORY.versions(self.kit_data.name)
+            self._add_rollback_button(kit_versions[0].version if kit_versions else None)
+
+    def on_install_stopped(self, kit_name: str, error: str = None) -> None:
+        """Restores the install button after a cancelled or failed install.
+
+        Args:
+            kit_name: The name of the kit.
+            error: The error of a failed install.
+        """
+        if kit_name == self.kit_data.name:
+            self._add_action_button()
 
 
 class KitInfoWidget(QWidget):
@@ -319,6 +574,7 @@ class KitInfoWidget(QWidget):
 
 class KitSearchBar(QWidget):
     """Custom search bar for the kits tab."""
+    search_requested = Signal(int, str)
 
     def __init__(self, kit_tab: 'KitsTab', parent: QWidget = None):
         """Initialization of the search bar for the kits tab.
@@ -329,8 +585,11 @@ class KitSearchBar(QWidget):
         """
         super(KitSearchBar, self).__init__(parent)
         self.kit_tab = kit_tab
+        self.request_id = 0
+        self.search_text = ""
         # Build the UI
         self._build_ui()
+        self._start_worker()
 
     def _build_ui(self) -> None:
         """Builds the UI for the search bar."""
@@ -343,37 +602,84 @@ class KitSearchBar(QWidget):
         # Set placeholder property for css.
         self.search_bar.setProperty("placeholder", True)
         self.base_layout.addWidget(self.search_bar)
+        # Wait for typing to pause before searching.
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(SearchConfig.DEBOUNCE_MS)
+        self.debounce.timeout.connect(lambda: self.search(self.search_bar.text()))
         # Connect search bar to search function.
-        self.search_bar.textChanged.connect(self.search)
+        self.search_bar.textChanged.connect(self.on_text_changed)
+
+    def _start_worker(self) -> None:
+        """Spawns a thread to run the searches off the GUI thread."""
+        self.thread = QThread()
+        self.worker = SearchWorker()
+        self.worker.moveToThread(self.thread)
+        self.search_requested.connect(self.worker.run)
+        self.worker.finished.connect(self.on_search_finished)
+        self.worker.error.connect(self.on_search_error)
+        QCoreApplication.instance().aboutToQuit.connect(self.stop)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stops the search thread."""
+        self.thread.quit()
+        self.thread.wait()
+
+    def on_text_changed(self, text: str) -> None:
+        """Updates the placeholder style and restarts the search delay.
 
-    def search(self, text: str) -> None:
-        """Handles searching the widgets and disabling the ones that do not match.
+        Args:
+            text: The search text.
+        """
+        show_placeholder = not bool(text)
+        if self.search_bar.property("placeholder") != show_placeholder:
+            self.search_bar.setProperty("placeholder", show_placeholder)
+            # Refresh the style to show/hide the placeholder.
+            self.search_bar.style().polish(self.search_bar)
+        self.debounce.start()
 
-        Note:
-            If there seems to be a performance issue,
-            consider using a QSortFilterProxyModel here.
+    def search(self, text: str) -> None:
+        """Queues a search for the given text on the search worker.
 
         Args:
             text: The search text.
         """
-        show_placeholder = not bool(text)
-        self.search_bar.setProperty("placeholder", show_placeholder)
-        # Refresh the style to show/hide the placeholder.
-        self.search_bar.style().polish(self.search_bar)
-        # Get id of all matching kits
-        kit_ids = search_kits(text)
-        # Iterate over all kits and set visibility based on search.
-        for kit_id, kit in enumerate(self.kit_tab.kits):
-            if kit_id in kit_ids:
-                kit.setVisible(True)
-            else:
-                kit.setVisible(False)
+        self.debounce.stop()
+        if not self.thread.isRunning():
+            # Stopped when the window was closed, the launcher shows the same window again.
+            self.thread.start()
+        self.request_id += 1
+        self.search_text = text
+        # Flag all queued searches as stale before queueing the new one.
+        self.worker.latest_request = self.request_id
+        self.search_requested.emit(self.request_id, text)
+
+    def on_search_finished(self, request_id: int, kit_ids: List[int]) -> None:
+        """Applies the search results if they belong to the latest search.
 
-        # Iterate over all local kits that are not in the database.
-        search_terms = [s.strip().lower() for s in text.split(",")]
+        Args:
+            request_id: The id of the finished search request.
+            kit_ids: The id of all kits matching the search.
+        """
+        if request_id != self.request_id:
+            # A newer search is in flight, ignore the stale results.
+            return
+        self.apply_results(self.search_text, kit_ids)
 
-        for kit in self.kit_tab.local_kits:
-            if any(term in kit.content.kit_info.name.lower() for term in search_terms):
-                kit.setVisible(True)
-            else:
-                kit.setVisible(False)
+    def on_search_error(self, error: str) -> None:
+        """Handles the error from the search worker.
+
+        Args:
+            error: The error raised by the worker.
+        """
+        print(f"Error: {error}")
+
+    def apply_results(self, text: str, kit_ids: List[int]) -> None:
+        """Filters the kits list down to the kits that match the search, by relevance.
+
+        Args:
+            text: The search text.
+            kit_ids: The id of all kits matching the search.
+        """
+        self.kit_tab.kits_view.proxy.set_search(text, kit_ids)
@@ -1,25 +1,27 @@
 """MKC core tab widgets."""
-from typing import List, Dict, Type, TypeVar
+from typing import Dict, Type, TypeVar
 
 try:
-    from PySide6.QtGui import QPixmap
+    from PySide6.QtGui import QPixmap, QImage
     from PySide6.QtCore import Qt, QThread, Signal
     from PySide6.QtWidgets import (
-        QLabel, QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QStyle
+        QLabel, QWidget, QVBoxLayout, QHBoxLayout, QStyle
     )
 except ImportError:
     # Fallback to PySide2 if PySide6 is not available
-    from PySide2.QtGui import QPixmap
+    from PySide2.QtGui import QPixmap, QImage
     from PySide2.QtCore import Qt, QThread, Signal
     from PySide2.QtWidgets import (
-        QLabel, QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QStyle
+        QLabel, QWidget, QVBoxLayout, QHBoxLayout, QStyle
     )
 
-from ..prefs import Text, AuthorData, KEYS, TabRequest, DATA
-from ..files import Paths
-from ..database import get_kits, get_author_kits, get_author
-from ..github import DatabaseWorker, AvatarWorker
-from .core import FoldContainer, KitSearchBar, KitWidget, KitInfoWidget
+from ..prefs import Text, AuthorData, KEYS, TabRequest, ImageConfig
+from ..files import Paths, get_avatar_path
+from ..database import get_author, seed_database
+from ..github import DatabaseWorker, AvatarWorker, AVATARS_SYNCED
+from ..update import InstallManager, get_outdated_kits
+from .core import KitSearchBar, Button
+from .views import KitListView
 
 
 class KitsTab(QWidget):
@@ -33,9 +35,9 @@ class KitsTab(QWidget):
             parent: Widget to set as parent.
         """
         super(KitsTab, self).__init__(parent)
-        self.kits: List[FoldContainer] = []
-        self.local_kits: List[FoldContainer] = []
         self._build_ui()
+        # Show the local database right away, then sync with the latest in the background.
+        self._load_local_database()
         self._sync_database()
 
     def _build_ui(self) -> None:
@@ -48,23 +50,35 @@ class KitsTab(QWidget):
         self.base_layout = QVBoxLayout()
         self.base_layout.setContentsMargins(0, 0, 0, 0)
         self.base_layout.setAlignment(Qt.AlignTop)
-        self.base_layout.addWidget(self.search_bar)
+        # Search bar and batch update button
+        self.btn_update_all = Button(Text.update_all.format(count=0))
+        self.btn_update_all.setDisabled(True)
+        self.header_layout = QHBoxLayout()
+        self.header_layout.setContentsMargins(0, 0, 0, 0)
+        self.header_layout.addWidget(self.search_bar, stretch=1)
+        self.header_layout.addWidget(self.btn_update_all)
+        self.base_layout.addLayout(self.header_layout)
         self.base_widget.setLayout(self.base_layout)
-        # Scroll area for kits
-        self.kits_widget = QWidget()
-        self.kits_scroll = QScrollArea()
-        self.kits_scroll.setContentsMargins(0, 0, 0, 0)
-        self.kits_scroll.setWidget(self.kits_widget)
-        self.kits_scroll.setWidgetResizable(True)
-        self.kits_layout = QVBoxLayout()
-        self.kits_layout.setContentsMargins(0, 0, 0, 0)
-        self.kits_layout.setAlignment(Qt.AlignTop)
-        self.kits_scroll.setWidget(self.kits_widget)
-        self.kits_widget.setLayout(self.kits_layout)
+        # Virtualized list for kits
+        self.kits_view = KitListView()
+        self.kits_view.setContentsMargins(0, 0, 0, 0)
+        # Link the author request signal of the kit widgets, the author is resolved on click.
+        self.kits_view.author_clicked.connect(self.on_author_clicked)
         # Add Kits to the base layout
-        self.base_layout.addWidget(self.kits_scroll)
+        self.base_layout.addWidget(self.kits_view)
         # Set the base layout as the main layout
         self.setLayout(self.base_layout)
+        # Keep the batch update button in sync with the kits and the running installs.
+        installs = InstallManager.shared()
+        self.btn_update_all.clicked.connect(self.on_update_all)
+        self.kits_view.source_model.loaded.connect(self._update_all_state)
+        for signal in (installs.started, installs.finished, installs.cancelled, installs.error, installs.idle):
+            signal.connect(self._update_all_state)
+
+    def _load_local_database(self) -> None:
+        """Shows the kits from the local database, seeding it from the bundled one if required."""
+        if seed_database():
+            self._add_kits()
 
     def _sync_database(self) -> None:
         """Spawns a thread to handle pulling the latest kit database."""
@@ -77,40 +91,49 @@ class KitsTab(QWidget):
         self.thread.start()
 
     def _add_kits(self) -> None:
-        """Iterate over the kits database table and add the kits to the UI."""
-        # Get copy of installed kits.
-        installed_kits = DATA.modo_kits.copy()
-        database_kits = get_kits()
-
-        for kit_name, kit_data in database_kits.items():
-            # Generate a collapsable container.
-            kit_container = FoldContainer(name=kit_data.label, version=kit_data.version)
-            kit_widget = KitWidget(kit_data)
-            kit_container.set_content(kit_widget)
-            # Get the author data for the kit,
-            author_data = {'author_data': get_author(kit_data.author)}
-            author_request = TabRequest(type=KEYS.AUTHORS, name=kit_data.author, show=True, kwargs=author_data)
-            # Link the author request signal to the kit widget
-            kit_widget.author_clicked.connect(lambda clicked, r=author_request: self.author_request.emit(r))
-            self.kits.append(kit_container)
-            self.kits_layout.addWidget(kit_container)
-            # If the kit is installed, remove it from the installed kits list.
-            if kit_name in installed_kits:
-                del installed_kits[kit_name]
-
-        # Add the installed kits that are not in the database.
-        for kit_name, kit_info in installed_kits.items():
-            kit_container = FoldContainer(name=kit_name, version=kit_info.version)
-            kit_info_widget = KitInfoWidget(kit_info)
-            kit_container.set_content(kit_info_widget)
-            self.local_kits.append(kit_container)
-            self.kits_layout.addWidget(kit_container)
+        """Loads the kits database table, and the installed kits not in it, into the kits list."""
+        self.kits_view.source_model.load_catalog()
+
+    def on_author_clicked(self, author: str) -> None:
+        """Requests a tab for the author of a kit.
+
+        Args:
+            author: The name of the author that was clicked.
+        """
+        try:
+            author_data = {'author_data': get_author(author)}
+        except LookupError as error:
+            print(f"Error: {error}")
+            return
+        author_request = TabRequest(type=KEYS.AUTHORS, name=author, show=True, kwargs=author_data)
+        self.author_request.emit(author_request)
+
+    def on_update_all(self) -> None:
+        """Updates all outdated kits at once, or cancels the running updates."""
+        installs = InstallManager.shared()
+        if installs.pending():
+            installs.cancel_all()
+        else:
+            installs.update_all(get_outdated_kits())
+
+    def _update_all_state(self) -> None:
+        """Shows the number of outdated kits, or running installs, on the batch update button."""
+        installs = InstallManager.shared()
+        if installs.pending():
+            self.btn_update_all.setText(Text.update_all_progress.format(count=installs.pending()))
+            self.btn_update_all.setDisabled(False)
+            return
+        outdated = len(get_outdated_kits())
+        self.btn_update_all.setText(Text.update_all.format(count=outdated))
+        self.btn_update_all.setDisabled(not outdated)
 
     def on_finished(self) -> None:
         """Handles the completion of the database worker."""
         self.thread.quit()
         self.thread.wait()
-        self._add_kits()
+        if self.worker.updated or not self.kits_view.source_model.rowCount():
+            # Apply only the kits that changed in the new database.
+            self.kits_view.source_model.update_catalog()
 
     def on_error(self, error: str) -> None:
         """Handles the error from the database worker.
@@ -118,16 +141,17 @@ class KitsTab(QWidget):
         Args:
             error: The error raised by the worker.
         """
+        # The kits from the local database stay displayed.
         print(f"Error: {error}")
         self.thread.quit()
         self.thread.wait()
 
 
-class AuthorTab(QScrollArea):
+class AuthorTab(QWidget):
     """Class to display the author information in the main UI."""
 
     def __init__(self, author_data: AuthorData, parent: QWidget = None) -> None:
-        """Scroll area that populates with incoming author information.
+        """Tab that populates with incoming author information, the kits list scrolls on its own.
 
         Args:
             author_data: Data for the given author.
@@ -144,20 +168,15 @@ class AuthorTab(QScrollArea):
 
     def _build_ui(self) -> None:
         """Builds the UI for the author tab."""
-        self.base_widget = QWidget()
         self.base_layout = QVBoxLayout()
-        self.base_layout.setAlignment(Qt.AlignCenter)
         self.base_layout.setContentsMargins(0, 0, 0, 0)
-        self.base_layout.setAlignment(Qt.AlignTop)
-
-        self.base_widget.setLayout(self.base_layout)
-        self.setWidgetResizable(True)
-        self.setWidget(self.base_widget)
+        self.setLayout(self.base_layout)
 
-        # Load avatar if it exists.
-        self.avatar = Paths.AVATAR
+        # Load the cached avatar if it exists, otherwise the default avatar.
+        cached_avatar = get_avatar_path(self.data.name)
+        self.avatar = cached_avatar if cached_avatar.exists() else Paths.AVATAR
         self.avatar_lbl = QLabel()
-        self.avatar_lbl.setFixedSize(120, 100)
+        self.avatar_lbl.setFixedSize(120, ImageConfig.AVATAR_HEIGHT)
         self.avatar_pix = QPixmap(self.avatar.as_posix())
         # Load avatar image into the label.
         self._add_avatar()
@@ -168,10 +187,16 @@ class AuthorTab(QScrollArea):
         # Add links layout.
         self.links_layout = QHBoxLayout()
         self.base_layout.addLayout(self.links_layout)
+        # Add the author's kits, filtered from the shared kits list.
+        self.kits_view = KitListView(author=self.data.name)
+        self.base_layout.addWidget(self.kits_view, stretch=1)
 
     def _sync_avatar(self) -> None:
         """Syncs the local avatar with the database avatar."""
-        # Fetch the avatar from the database and save it locally.
+        if self.data.name in AVATARS_SYNCED and self.avatar != Paths.AVATAR:
+            # The cached avatar was already revalidated this session.
+            return
+        # Revalidate the avatar in the background, updating the avatar cache.
         self.thread = QThread()
         self.worker = AvatarWorker(self.data.name)
         self.worker.moveToThread(self.thread)
@@ -180,15 +205,18 @@ class AuthorTab(QScrollArea):
         self.thread.started.connect(self.worker.run)
         self.thread.start()
 
-    def on_avatar_finished(self, avatar: QPixmap) -> None:
-        """Sets the avatar pixmap to the label.
+    def on_avatar_finished(self, avatar: QImage) -> None:
+        """Sets the avatar to the label.
 
         Args:
-            avatar: The avatar pixmap to set.
+            avatar: The scaled avatar image to set, null if the cached avatar is still current.
         """
         self.thread.quit()
         self.thread.wait()
-        self.avatar_pix = avatar
+        if avatar.isNull():
+            return
+        # Pixmaps can only be created on the GUI thread.
+        self.avatar_pix = QPixmap.fromImage(avatar)
         self._add_avatar()
 
     def on_avatar_error(self, error: str) -> None:
@@ -203,7 +231,10 @@ class AuthorTab(QScrollArea):
 
     def _add_avatar(self) -> None:
         """Adds the author's avatar to the author tab."""
-        avatar_pix = self.avatar_pix.scaledToHeight(100)
+        avatar_pix = self.avatar_pix
+        if avatar_pix.height() != ImageConfig.AVATAR_HEIGHT:
+            # Only the default avatar is not stored at the display size.
+            avatar_pix = avatar_pix.scaledToHeight(ImageConfig.AVATAR_HEIGHT)
         self.avatar_lbl.setPixmap(avatar_pix)
 
     def _add_links(self) -> None:
@@ -215,14 +246,9 @@ class AuthorTab(QScrollArea):
             self.links_layout.addWidget(link_lbl)
 
     def _add_kits(self) -> None:
-        """Iterate over the author's kits and add them to the UI."""
-        for authors_kit in get_author_kits(self.data.name):
-            # Add fold-able element for each kit
-            folder = FoldContainer(name=authors_kit.label, version=authors_kit.version)
-            # Since we are on the authors tab, don't show the author on each kit.
-            kit_widget = KitWidget(authors_kit, show_author=False)
-            folder.set_content(kit_widget)
-            self.base_layout.addWidget(folder)
+        """Ensures the shared kits list is loaded so the author's kits are shown."""
+        if not self.kits_view.source_model.rowCount():
+            self.kits_view.source_model.load_catalog()
 
 
 class InfoTab(QWidget):
@@ -0,0 +1,572 @@
+"""Model/View widgets to display the kits catalog in Modo Kit Central."""
+from time import perf_counter
+from typing import List, Dict, Set, Union, Optional, Iterator, Any
+
+try:
+    from PySide6.QtGui import QPainter
+    from PySide6.QtCore import (
+        Qt, Signal, QAbstractListModel, QSortFilterProxyModel, QModelIndex, QPersistentModelIndex,
+        QSize, QTimer, QPoint
+    )
+    from PySide6.QtWidgets import (
+        QWidget, QListView, QStyledItemDelegate, QStyleOptionViewItem, QAbstractItemView, QStyle, QFrame
+    )
+except ImportError:
+    # Fallback to PySide2 if PySide6 is not available
+    from PySide2.QtGui import QPainter
+    from PySide2.QtCore import (
+        Qt, Signal, QAbstractListModel, QSortFilterProxyModel, QModelIndex, QPersistentModelIndex,
+        QSize, QTimer, QPoint
+    )
+    from PySide2.QtWidgets import (
+        QWidget, QListView, QStyledItemDelegate, QStyleOptionViewItem, QAbstractItemView, QStyle, QFrame
+    )
+
+from ..prefs import DATA, KitData, KitInfo, PopulateConfig
+from ..database import iter_kits
+from .core import FoldContainer, KitWidget, KitInfoWidget
+
+# An entry of the kits list, either a kit from the database or an installed kit that is not.
+KitEntry = Union[KitData, KitInfo]
+# The unique key of an entry, the database id of a kit or the name of an installed kit.
+KitKey = Union[int, str]
+
+# Custom data roles of the kit list model.
+KitRole = Qt.UserRole + 1
+KeyRole = Qt.UserRole + 2
+
+
+def entry_key(entry: KitEntry) -> KitKey:
+    """Gets the unique key of a kit list entry.
+
+    Args:
+        entry: The entry to get the key for.
+
+    Returns:
+        The database id of a kit, or the name of an installed kit.
+    """
+    return entry.id if isinstance(entry, KitData) else entry.name
+
+
+class KitListModel(QAbstractListModel):
+    """List model of all kits in the catalog followed by the installed kits not in the catalog."""
+    loaded = Signal()
+    _shared: 'KitListModel' = None
+
+    def __init__(self, parent: QWidget = None) -> None:
+        """Initialization of the KitListModel.
+
+        Args:
+            parent: The parent object.
+        """
+        super(KitListModel, self).__init__(parent)
+        self.entries: List[KitEntry] = []
+        self.rows: Dict[KitKey, int] = {}
+        self.loader: Optional[Iterator[List[KitEntry]]] = None
+        # Adds the streamed entries in time slices, one per event loop cycle.
+        self.load_timer = QTimer(self)
+        self.load_timer.setInterval(0)
+        self.load_timer.timeout.connect(self._load_step)
+
+    @classmethod
+    def shared(cls) -> 'KitListModel':
+        """Gets the model shared by all kit views.
+
+        Returns:
+            The shared kit list model.
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        """PySide method: The number of entries in the model.
+
+        Args:
+            parent: The parent index, always invalid for a list.
+
+        Returns:
+            The number of entries.
+        """
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        """PySide method: Gets the data of an entry for the given role.
+
+        Args:
+            index: The index of the entry.
+            role: The data role to get.
+
+        Returns:
+            The data for the role, or None if the role isn't supported.
+        """
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            label = entry.label if isinstance(entry, KitData) else entry.name
+            return f"{label} v{entry.version}" if entry.version else label
+        elif role == KitRole:
+            return entry
+        elif role == KeyRole:
+            return entry_key(entry)
+        return None
+
+    def set_entries(self, entries: List[KitEntry]) -> None:
+        """Replaces all entries of the model.
+
+        Args:
+            entries: The new entries.
+        """
+        self.beginResetModel()
+        self.entries = list(entries)
+        self.rows = {entry_key(entry): row for row, entry in enumerate(self.entries)}
+        self.endResetModel()
+
+    def append_entries(self, entries: List[KitEntry]) -> None:
+        """Adds entries to the end of the model.
+
+        Args:
+            entries: The entries to add.
+        """
+        self.insert_entries(len(self.entries), entries)
+
+    def insert_entries(self, first: int, entries: List[KitEntry]) -> None:
+        """Inserts entries into the model at the given row.
+
+        Args:
+            first: The row to insert the entries at.
+            entries: The entries to insert.
+        """
+        if not entries:
+            return
+        self.beginInsertRows(QModelIndex(), first, first + len(entries) - 1)
+        self.entries[first:first] = entries
+        # Only the rows from the insertion point onwards moved.
+        for row in range(first, len(self.entries)):
+            self.rows[entry_key(self.entries[row])] = row
+        self.endInsertRows()
+
+    @property
+    def loading(self) -> bool:
+        """If the model is still streaming in the catalog."""
+        return self.loader is not None
+
+    def load_catalog(self) -> None:
+        """Streams the catalog kits, then the installed kits not in it, into the model.
+
+        Notes:
+            Entries are added in bounded time slices across event loop cycles, so the first kits
+            show up right away and the UI stays responsive for large catalogs.
+        """
+        self.load_timer.stop()
+        self.set_entries([])
+        self.loader = self._iter_catalog()
+        # Add the first slice right away, then continue on the following event loop cycles.
+        self._load_step()
+        if self.loading:
+            self.load_timer.start()
+
+    def update_catalog(self) -> None:
+        """Applies only the differences between the model and the catalog.
+
+        Notes:
+            Kits that are gone are removed, kits whose data changed are updated in place and
+            new kits are added at the end, so views keep their scroll position and open kits.
+        """
+        if self.loading or not self.entries:
+            # Nothing shown yet to preserve, stream the catalog in.
+            self.load_catalog()
+            return
+
+        latest = {entry_key(entry): entry for batch in self._iter_catalog() for entry in batch}
+        # Remove the entries that are gone, from the bottom up so the rows stay valid.
+        for row in reversed(range(len(self.entries))):
+            if entry_key(self.entries[row]) not in latest:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.entries[row]
+                self.endRemoveRows()
+        self.rows = {entry_key(entry): row for row, entry in enumerate(self.entries)}
+
+        # Update the entries whose data changed.
+        for row, entry in enumerate(self.entries):
+            latest_entry = latest[entry_key(entry)]
+            if latest_entry != entry:
+                self.entries[row] = latest_entry
+                index = self.index(row, 0)
+                self.dataChanged.emit(index, index)
+
+        # Add the new entries, catalog kits before the installed kits that are not in the catalog.
+        new_entries = [entry for key, entry in latest.items() if key not in self.rows]
+        new_kits = [entry for entry in new_entries if isinstance(entry, KitData)]
+        first_local = next(
+            (row for row, entry in enumerate(self.entries) if not isinstance(entry, KitData)), len(self.entries)
+        )
+        self.insert_entries(first_local, new_kits)
+        self.append_entries([entry for entry in new_entries if not isinstance(entry, KitData)])
+        self.loaded.emit()
+
+    def _iter_catalog(self) -> Iterator[List[KitEntry]]:
+        """Yields the catalog kits in batches, followed by the installed kits not in the catalog.
+
+        Yields:
+            The next batch of entries.
+        """
+        catalog_names = set()
+        for kits in iter_kits(PopulateConfig.BATCH_SIZE):
+            catalog_names.update(kit.name for kit in kits)
+            yield kits
+
+        installed_kits = DATA.modo_kits or {}
+        yield [kit_info for name, kit_info in installed_kits.items() if name not in catalog_names]
+
+    def _load_step(self) -> None:
+        """Adds streamed entries to the model until the time slice is used up."""
+        if self.loader is None:
+            return
+        deadline = perf_counter() + PopulateConfig.TIME_SLICE_MS / 1000
+        batch = []
+        while perf_counter() < deadline:
+            try:
+                batch.extend(next(self.loader))
+            except StopIteration:
+                self.loader = None
+                self.load_timer.stop()
+                break
+        # Insert everything gathered during this slice at once.
+        self.append_entries(batch)
+        if self.loader is None:
+            self.loaded.emit()
+
+
+class KitFilterProxyModel(QSortFilterProxyModel):
+    """Proxy model to filter the kits by author or search results, ordered by search relevance."""
+
+    def __init__(self, author: str = None, parent: QWidget = None) -> None:
+        """Initialization of the KitFilterProxyModel.
+
+        Args:
+            author: Only accept the kits of this author if given.
+            parent: The parent object.
+        """
+        super(KitFilterProxyModel, self).__init__(parent)
+        self.author = author
+        self.ranks: Optional[Dict[int, int]] = None
+        self.search_terms: List[str] = []
+
+    def set_search(self, text: str, kit_ids: List[int]) -> None:
+        """Filters and orders the kits by the results of a search.
+
+        Args:
+            text: The search text, used to match the installed kits that are not in the catalog.
+            kit_ids: The id of all kits matching the search, ordered by relevance.
+        """
+        if text.strip():
+            self.ranks = {kit_id: rank for rank, kit_id in enumerate(kit_ids)}
+            self.search_terms = [s.strip().lower() for s in text.split(",")]
+        else:
+            # No search, accept everything in the model order.
+            self.ranks = None
+            self.search_terms = []
+        self.invalidate()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        """PySide method: Checks if the entry passes the author and search filters.
+
+        Args:
+            source_row: The row of the entry in the source model.
+            source_parent: The parent index in the source model.
+
+        Returns:
+            True if the entry should be shown, otherwise False.
+        """
+        entry = self.sourceModel().entries[source_row]
+        is_kit = isinstance(entry, KitData)
+        if self.author is not None and not (is_kit and entry.author == self.author):
+            return False
+        if self.ranks is None:
+            return True
+        if is_kit:
+            return entry.id in self.ranks
+        # Installed kits that are not in the catalog are matched by name.
+        return any(term in entry.name.lower() for term in self.search_terms)
+
+    def lessThan(self, left: QModelIndex, right: QModelIndex) -> bool:
+        """PySide method: Orders the entries by search relevance, then by model order.
+
+        Args:
+            left: The left source index.
+            right: The right source index.
+
+        Returns:
+            True if left should be shown before right.
+        """
+        return self._sort_key(left.row()) < self._sort_key(right.row())
+
+    def _sort_key(self, source_row: int) -> tuple:
+        """Gets the sort key of an entry.
+
+        Args:
+            source_row: The row of the entry in the source model.
+
+        Returns:
+            The search rank of the entry followed by its source row.
+        """
+        if self.ranks is None:
+            return 0, source_row
+        entry = self.sourceModel().entries[source_row]
+        # Kits that are not ranked, the installed kits, are placed after all ranked kits.
+        rank = self.ranks.get(entry.id, len(self.ranks)) if isinstance(entry, KitData) else len(self.ranks)
+        return rank, source_row
+
+
+class KitDelegate(QStyledItemDelegate):
+    """Delegate that builds the rich kit widgets as editors of the visible rows only."""
+
+    def __init__(self, view: 'KitListView') -> None:
+        """Initialization of the KitDelegate.
+
+        Args:
+            view: The view the delegate is drawing for.
+        """
+        super(KitDelegate, self).__init__(view)
+        self.view = view
+
+    def createEditor(self, parent: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> QWidget:
+        """PySide method: Builds the fold container of a kit.
+
+        Args:
+            parent: The widget to parent the editor to.
+            option: The style options of the row.
+            index: The index of the row.
+
+        Returns:
+            The fold container holding the kit's widget.
+        """
+        entry = index.data(KitRole)
+        label = entry.label if isinstance(entry, KitData) else entry.name
+        container = FoldContainer(name=label, version=entry.version, parent=parent)
+        # Only the header is built now, the kit's widget is built when first opened.
+        container.set_content_factory(lambda: self._build_content(entry, container))
+
+        key = entry_key(entry)
+        if key in self.view.expanded:
+            container.set_expanded(True)
+        # Track the expanded state and resize the row along with the fold animation.
+        persistent_index = QPersistentModelIndex(index)
+        container.toggle_button.toggled.connect(lambda checked: self.view.set_expanded(key, checked))
+        container.height_changed.connect(lambda: self._resize_row(persistent_index))
+        return container
+
+    def _build_content(self, entry: KitEntry, container: FoldContainer) -> QWidget:
+        """Builds the widget displaying the details of a kit.
+
+        Args:
+            entry: The kit to build the widget for.
+            container: The fold container the widget is built for.
+
+        Returns:
+            The kit's widget.
+        """
+        if isinstance(entry, KitInfo):
+            return KitInfoWidget(entry)
+        kit_widget = KitWidget(entry, show_author=self.view.show_author)
+        kit_widget.author_clicked.connect(self.view.author_clicked)
+        # Make room for banners fetched after the container opened.
+        kit_widget.banner_added.connect(container.fit_content)
+        return kit_widget
+
+    def setEditorData(self, editor: QWidget, index: QModelIndex) -> None:
+        """PySide method: The editor is built from the data, nothing to update.
+
+        Args:
+            editor: The fold container.
+            index: The index of the row.
+        """
+
+    def updateEditorGeometry(self, editor: QWidget, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        """PySide method: Fills the row with the editor.
+
+        Args:
+            editor: The fold container.
+            option: The style options of the row.
+            index: The index of the row.
+        """
+        editor.setGeometry(option.rect)
+
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex) -> QSize:
+        """PySide method: Gets the size of a row, following the fold animation of its editor.
+
+        Args:
+            option: The style options of the row.
+            index: The index of the row.
+
+        Returns:
+            The size of the row.
+        """
+        editor = self.view.indexWidget(index)
+        if editor is None:
+            return QSize(0, self.view.row_height)
+        # The fold animation drives the minimum and maximum height of the container.
+        height = max(editor.minimumHeight(), editor.sizeHint().height())
+        return QSize(0, min(editor.maximumHeight(), height))
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex) -> None:
+        """PySide method: Draws a plain header for rows that don't have their editor yet.
+
+        Args:
+            painter: The painter to draw with.
+            option: The style options of the row.
+            index: The index of the row.
+        """
+        if self.view.indexWidget(index) is not None:
+            return
+        option = QStyleOptionViewItem(option)
+        self.initStyleOption(option, index)
+        option.state &= ~QStyle.State_Selected
+        style = option.widget.style() if option.widget else self.view.style()
+        style.drawControl(QStyle.CE_ItemViewItem, option, painter, option.widget)
+
+    def _resize_row(self, index: QPersistentModelIndex) -> None:
+        """Tells the view the row of the given index changed its size.
+
+        Args:
+            index: The index of the row.
+        """
+        if index.isValid():
+            self.sizeHintChanged.emit(QModelIndex(index))
+
+
+class KitListView(QListView):
+    """Virtualized list of kits, only the visible rows have a rich kit widget."""
+    author_clicked = Signal(str)
+
+    def __init__(self, author: str = None, parent: QWidget = None) -> None:
+        """Initialization of the KitListView.
+
+        Args:
+            author: Only show the kits of this author if given.
+            parent: The parent widget.
+        """
+        super(KitListView, self).__init__(parent)
+        self.show_author = author is None
+        self.row_height = 20
+        self.overscan = 2
+        self.expanded: Set[KitKey] = set()
+        self.editors: Dict[KitKey, QPersistentModelIndex] = {}
+        self.source_model = KitListModel.shared()
+        self.proxy = KitFilterProxyModel(author, self)
+        self.proxy.setSourceModel(self.source_model)
+        self.proxy.sort(0)
+        self.delegate = KitDelegate(self)
+        # Coalesce all requests to update the editors into one per event loop cycle.
+        self.sync_timer = QTimer(self)
+        self.sync_timer.setSingleShot(True)
+        self.sync_timer.setInterval(0)
+        self.sync_timer.timeout.connect(self.sync_editors)
+        self._build_ui()
+        self._connect_ui()
+
+    def _build_ui(self) -> None:
+        """Sets up the view properties."""
+        self.setModel(self.proxy)
+        self.setItemDelegate(self.delegate)
+        self.setFrameShape(QFrame.NoFrame)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSpacing(1)
+
+    def _connect_ui(self) -> None:
+        """Connects the view and model changes to the editor updates."""
+        self.verticalScrollBar().valueChanged.connect(self.schedule_sync)
+        self.proxy.modelReset.connect(self._on_model_reset)
+        self.proxy.layoutChanged.connect(self.schedule_sync)
+        self.proxy.rowsInserted.connect(self.schedule_sync)
+        self.proxy.rowsRemoved.connect(self.schedule_sync)
+        self.proxy.dataChanged.connect(self._on_data_changed)
+
+    def set_expanded(self, key: KitKey, expanded: bool) -> None:
+        """Tracks the expanded state of a kit, so it is restored when its editor is rebuilt.
+
+        Args:
+            key: The key of the kit.
+            expanded: If the kit is expanded.
+        """
+        if expanded:
+            self.expanded.add(key)
+        else:
+            self.expanded.discard(key)
+
+    def schedule_sync(self, *args) -> None:
+        """Schedules an update of the editors on the next event loop cycle."""
+        self.sync_timer.start()
+
+    def sync_editors(self) -> None:
+        """Opens the editors of the visible rows and closes the ones that scrolled out of view."""
+        visible = self._visible_indexes()
+        # Close editors that are no longer visible or whose row was filtered out.
+        for key, index in list(self.editors.items()):
+            if not index.isValid() or key not in visible:
+                if index.isValid():
+                    self.closePersistentEditor(QModelIndex(index))
+                del self.editors[key]
+        # Open editors for the newly visible rows.
+        for key, index in visible.items():
+            if key not in self.editors:
+                self.openPersistentEditor(index)
+                self.editors[key] = QPersistentModelIndex(index)
+
+    def _visible_indexes(self) -> Dict[KitKey, QModelIndex]:
+        """Gets the indexes of all rows within the viewport, plus a few rows of overscan.
+
+        Returns:
+            The visible indexes by kit key.
+        """
+        row_count = self.proxy.rowCount()
+        if not row_count:
+            return {}
+        first = self.indexAt(QPoint(1, 1))
+        start = max(0, (first.row() if first.isValid() else 0) - self.overscan)
+        height = self.viewport().height()
+
+        visible = {}
+        below = 0
+        for row in range(start, row_count):
+            index = self.proxy.index(row, 0)
+            if self.visualRect(index).top() > height:
+                # Keep a few rows below the viewport ready, then stop.
+                if below >= self.overscan:
+                    break
+                below += 1
+            visible[index.data(KeyRole)] = index
+        return visible
+
+    def _on_data_changed(self, top_left: QModelIndex, bottom_right: QModelIndex, *args) -> None:
+        """Rebuilds the editors of the rows whose kit data changed.
+
+        Args:
+            top_left: The first changed index.
+            bottom_right: The last changed index.
+        """
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            key = self.proxy.index(row, 0).data(KeyRole)
+            index = self.editors.pop(key, None)
+            if index is not None and index.isValid():
+                self.closePersistentEditor(QModelIndex(index))
+        self.schedule_sync()
+
+    def _on_model_reset(self) -> None:
+        """Drops the editors of the previous model state."""
+        self.editors.clear()
+        self.schedule_sync()
+
+    def resizeEvent(self, event: Any) -> None:
+        """PySide method: Update the editors when the viewport size changes.
+
+        Args:
+            event: The resize event.
+        """
+        super(KitListView, self).resizeEvent(event)
+        self.schedule_sync()
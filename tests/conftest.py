@@ -0,0 +1,8 @@
+"""Test configuration for Modo Kit Central."""
+import os
+import sys
+from pathlib import Path
+
+# Run without modo, with the mocked installed kits.
+os.environ.setdefault("MKC_LOCAL", "1")
+sys.path.insert(0, str(Path(__file__).parent.parent / "modo_kit_central"))
@@ -0,0 +1,119 @@
+"""Tests for the database helpers."""
+import sqlite3
+
+import pytest
+
+from mkc.database import CONNECTIONS, apply_changes, build_search_index, search_kits, valid_changeset
+
+
+@pytest.mark.parametrize("changeset", [
+    [{"from": "0.1.2", "to": "0.1.3"}],
+    {"from": "0.1.1", "to": "0.1.3"},
+    {"from": "0.1.2"},
+    {"from": "0.1.2", "to": "0.1.3", "kits": [{"name": "Kit"}]},
+    {"from": "0.1.2", "to": "0.1.3", "kits": {"upsert": {"name": "Kit"}}},
+    {"from": "0.1.2", "to": "0.1.3", "kits": {"upsert": [["name", "Kit"]]}},
+    {"from": "0.1.2", "to": "0.1.3", "kits": {"upsert": [{"version": "1.0"}]}},
+    {"from": "0.1.2", "to": "0.1.3", "authors": {"delete": "Author"}},
+])
+def test_invalid_changeset(changeset):
+    assert not valid_changeset(changeset, "0.1.2")
+
+
+def test_valid_changeset():
+    changeset = {
+        "from": "0.1.2",
+        "to": "0.1.3",
+        "kits": {"upsert": [{"name": "Kit", "version": "1.0"}], "delete": ["Old Kit"]},
+    }
+    assert valid_changeset(changeset, "0.1.2")
+
+
+@pytest.fixture
+def kits_database(tmp_path, monkeypatch):
+    """Creates a small kits database with a search index, used as the database of the queries."""
+    database = tmp_path / "kits.db"
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "CREATE TABLE kits (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, label TEXT, "
+            "author TEXT, version TEXT, description TEXT, search TEXT, url TEXT, help TEXT, repo TEXT, "
+            "has_banner BOOLEAN, installable BOOLEAN)"
+        )
+        connection.executemany(
+            "INSERT INTO kits (name, author, description, search) VALUES (?, ?, ?, ?)",
+            [("Mesh Ops", "Alice", "Mesh tools", "mesh,ops"), ("UV Kit", "Bob", "UV tools", "uv")]
+        )
+        connection.execute(
+            "CREATE TABLE authors (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, avatar BOOLEAN, "
+            "handle TEXT, links TEXT)"
+        )
+        connection.executemany("INSERT INTO authors (name) VALUES (?)", [("Alice",), ("Bob",)])
+    connection.close()
+    assert build_search_index(database)
+    monkeypatch.setattr(CONNECTIONS, "database", database)
+    CONNECTIONS.invalidate()
+    yield database
+    CONNECTIONS.invalidate()
+
+
+def test_search_kits_ranked(kits_database):
+    assert search_kits("mesh") == [1]
+    assert search_kits("uv, tool") == [2]
+
+
+@pytest.mark.parametrize("search_text", ["", " ", ",", " , "])
+def test_search_kits_blank(kits_database, search_text):
+    assert search_kits(search_text) == [1, 2]
+
+
+@pytest.mark.parametrize("search_text", ['"', "*", "- ()", '", .'])
+def test_search_kits_punctuation(kits_database, search_text):
+    assert search_kits(search_text) == []
+
+
+def read_rows(database, query):
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute(query).fetchall()
+    connection.close()
+    return rows
+
+
+def test_apply_changes(kits_database):
+    changesets = [
+        {
+            "from": "0.1.2", "to": "0.1.3",
+            "kits": {
+                "upsert": [
+                    {"id": 99, "name": "UV Kit", "version": "2.0", "unknown": "ignored"},
+                    {"name": "Zebra Kit", "author": "Carol", "description": "Stripes"},
+                ],
+                "delete": ["Mesh Ops"],
+            },
+            "authors": {"upsert": [{"name": "Carol", "handle": "carol"}]},
+        },
+        {"from": "0.1.3", "to": "0.1.4", "kits": {"upsert": [{"name": "Zebra Kit", "version": "1.1"}]}},
+    ]
+
+    apply_changes(kits_database, changesets)
+
+    # Existing rows keep their id, new rows are added and deleted rows removed.
+    assert read_rows(kits_database, "SELECT id, name, version FROM kits ORDER BY id") == [
+        (2, "UV Kit", "2.0"), (3, "Zebra Kit", "1.1")
+    ]
+    assert read_rows(kits_database, "SELECT name, handle FROM authors ORDER BY id")[-1] == ("Carol", "carol")
+    # The search index follows the changes.
+    assert search_kits("zebra") == [3]
+    assert search_kits("mesh") == []
+
+
+def test_apply_changes_is_all_or_nothing(kits_database):
+    changesets = [
+        {"from": "0.1.2", "to": "0.1.3", "kits": {"delete": ["Mesh Ops"]}},
+        # A kit without a name can't be inserted.
+        {"from": "0.1.3", "to": "0.1.4", "kits": {"upsert": [{"name": None, "version": "1.0"}]}},
+    ]
+
+    with pytest.raises(sqlite3.Error):
+        apply_changes(kits_database, changesets)
+
+    assert read_rows(kits_database, "SELECT name FROM kits ORDER BY id") == [("Mesh Ops",), ("UV Kit",)]
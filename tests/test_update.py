@@ -0,0 +1,129 @@
+"""Tests for the background kit installs."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("PySide6")
+pytest.importorskip("lx")
+
+from PySide6.QtCore import QCoreApplication, QEventLoop, QTimer
+
+from mkc import update
+from mkc.prefs import GithubAsset, InstallConfig, KitData, KitManifest
+
+
+@pytest.fixture(scope="module")
+def app():
+    """Runs the installs with an application, for the threads and queued signals."""
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def installs(app, tmp_path, monkeypatch):
+    """An install manager downloading fake lpks, recording the lpks loaded into modo."""
+    delays = {}
+    running = []
+    state = {"max_running": 0}
+    lock = threading.Lock()
+
+    def kit_download(lpk_asset, progress=None, cancel=None):
+        lpk_name = lpk_asset.name
+        with lock:
+            running.append(lpk_name)
+            state["max_running"] = max(state["max_running"], len(running))
+        # Later kits finish first, unless told otherwise.
+        deadline = time.monotonic() + delays.get(lpk_name, 0.05)
+        while time.monotonic() < deadline:
+            if cancel and cancel.is_set():
+                with lock:
+                    running.remove(lpk_name)
+                raise update.DownloadCancelled(lpk_name)
+            time.sleep(0.005)
+        lpk_file = tmp_path / f"{lpk_name}.lpk"
+        lpk_file.write_bytes(lpk_name.encode())
+        with lock:
+            running.remove(lpk_name)
+        return lpk_file
+
+    loaded = []
+    monkeypatch.setattr(update, "get_latest_kit", latest_kit)
+    monkeypatch.setattr(update, "kit_download", kit_download)
+    monkeypatch.setattr(update, "command", lambda name, filename: loaded.append(filename.rsplit("/", 1)[-1]))
+    monkeypatch.setattr(update.HISTORY, "root", tmp_path / "history")
+    manager = update.InstallManager()
+    manager.delays = delays
+    manager.loaded = loaded
+    manager.state = state
+    manager.idle_count = 0
+    manager.idle.connect(lambda: setattr(manager, "idle_count", manager.idle_count + 1))
+    return manager
+
+
+def latest_kit(kit):
+    """The manifest and lpk asset of a fake release of the kit."""
+    manifest = KitManifest(name=kit.name, version="1.0", description="")
+    return manifest, GithubAsset(name=kit.name, size=1024, url=f"https://example.com/{kit.name}.lpk")
+
+
+def make_kit(name):
+    """A kit from the database, installable from its releases."""
+    return KitData(id=0, name=name, label=name, author="Author", version="1.0", description="", search="")
+
+
+def wait_idle(manager, timeout_ms=5000):
+    """Runs the event loop until all installs are done."""
+    loop = QEventLoop()
+    manager.idle.connect(loop.quit)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loop.exec()
+    manager.idle.disconnect(loop.quit)
+
+
+def test_update_all_loads_in_order(installs):
+    names = [f"kit{index}" for index in range(5)]
+    for index, name in enumerate(names):
+        installs.delays[name] = 0.2 - index * 0.04
+
+    installs.update_all([make_kit(name) for name in names])
+    wait_idle(installs)
+
+    assert installs.loaded == [f"{name}.lpk" for name in names]
+    assert installs.state["max_running"] == InstallConfig.MAX_WORKERS
+    assert installs.idle_count == 1
+    assert installs.pending() == 0
+    # The installed versions are kept to roll back to.
+    assert [kit.version for kit in update.HISTORY.versions("kit0")] == ["1.0"]
+
+
+def test_cancel_all_loads_nothing(installs):
+    names = [f"kit{index}" for index in range(5)]
+    for name in names:
+        installs.delays[name] = 1.0
+    cancelled = []
+    installs.cancelled.connect(cancelled.append)
+
+    installs.update_all([make_kit(name) for name in names])
+    QTimer.singleShot(50, installs.cancel_all)
+    wait_idle(installs)
+
+    assert installs.loaded == []
+    assert sorted(cancelled) == names
+    assert installs.idle_count == 1
+
+
+def test_failed_kit_does_not_block_the_batch(installs, monkeypatch):
+    def get_latest_kit(kit):
+        if kit.name == "broken":
+            raise Exception("No latest lpk found in the release assets!")
+        return latest_kit(kit)
+
+    monkeypatch.setattr(update, "get_latest_kit", get_latest_kit)
+    errors = []
+    installs.error.connect(lambda name, error: errors.append(name))
+
+    installs.update_all([make_kit("first"), make_kit("broken"), make_kit("last")])
+    wait_idle(installs)
+
+    assert installs.loaded == ["first.lpk", "last.lpk"]
+    assert errors == ["broken"]